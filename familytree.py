@@ -0,0 +1,729 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+
+"""The family tree graph: individuals, families and their traversal."""
+
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import cast
+import array
+import collections
+import functools
+import os
+import sys
+
+import imagecache
+
+
+class Ged2DotException(Exception):
+    """An exception that is intentionally raised by ged2dot."""
+
+
+class Node:
+    """Base class for an individual or family."""
+    __slots__ = ("lazy_graph",)
+
+    def __init__(self) -> None:
+        # If set, then string IDs are resolved against this graph on first use.
+        self.lazy_graph: Optional["Graph"] = None
+
+    def resolve_lazily(self) -> None:
+        """Resolve string IDs to node objects, in case that was deferred."""
+        if self.lazy_graph is not None:
+            graph = self.lazy_graph
+            self.lazy_graph = None
+            self.resolve(graph)
+
+    def get_identifier(self) -> str:  # pragma: no cover
+        """Gets the ID of this node."""
+        return str()
+
+    def set_depth(self, depth: int) -> None:  # pragma: no cover
+        """Set the depth of this node, during one graph traversal."""
+        # pylint: disable=unused-argument
+
+    def get_depth(self) -> int:  # pragma: no cover
+        """Get the depth of this node, during one graph traversal."""
+        return 0
+
+    def get_neighbours(self, direction: str) -> List["Node"]:  # pragma: no cover
+        """Get the neighbour nodes of this node."""
+        return []
+
+    def resolve(self, graph: "Graph") -> None:  # pragma: no cover
+        """Resolve string IDs to node objects."""
+        # pylint: disable=unused-argument
+
+    def intern_strings(self) -> None:  # pragma: no cover
+        """Interns repeated strings again, e.g. after unpickling."""
+
+
+class Graph:
+    """A list of nodes in file order, with an identifier -> node index for fast lookups."""
+    def __init__(self) -> None:
+        self.nodes: List[Node] = []
+        self.index: Dict[str, Node] = {}
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def append(self, node: Node) -> None:
+        """Adds a new node to the graph."""
+        self.nodes.append(node)
+        # Invalid input may have duplicated identifiers, the first one wins.
+        self.index.setdefault(node.get_identifier(), node)
+
+    def find(self, identifier: str) -> Optional[Node]:
+        """Finds a node by its identifier."""
+        if not identifier:
+            return None
+        return self.index.get(identifier)
+
+    def resolve(self, lazy: bool = False) -> None:
+        """
+        Resolves string IDs to node objects in all nodes. If lazy is true, a node is only resolved
+        when its neighbours are first requested.
+        """
+        for node in self.nodes:
+            if lazy:
+                node.lazy_graph = self
+            else:
+                node.resolve(self)
+
+
+def graph_find(graph: Graph, identifier: str) -> Optional[Node]:
+    """Find identifier in graph."""
+    return graph.find(identifier)
+
+
+@functools.cache
+def get_abspath(path: str) -> str:
+    """Make a path absolute, taking the repo root as a base dir. Cached, as resolving the repo root needs syscalls."""
+    if os.path.isabs(path):
+        return path
+
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
+
+
+def get_data_abspath(gedcom: str, path: str) -> str:
+    """Make a path absolute, taking the gedcom file's dir as a base dir."""
+    if os.path.isabs(path):
+        return path
+
+    return os.path.join(os.path.dirname(os.path.realpath(gedcom)), path)
+
+
+class IndividualConfig:
+    """Key-value pairs on an individual."""
+    __slots__ = ("note", "birth", "death", "occupation")
+
+    def __init__(self) -> None:
+        self.note = ""
+        self.birth = ""
+        self.death = ""
+        self.occupation = ""
+
+    def set_note(self, note: str) -> None:
+        """Sets a note."""
+        self.note = note
+
+    def get_note(self) -> str:
+        """Gets a note."""
+        return self.note
+
+    def set_birth(self, birth: str) -> None:
+        """Sets the birth date."""
+        self.birth = sys.intern(birth)
+
+    def get_birth(self) -> str:
+        """Gets the birth date."""
+        return self.birth
+
+    def set_death(self, death: str) -> None:
+        """Sets the death date."""
+        self.death = sys.intern(death)
+
+    def get_death(self) -> str:
+        """Gets the death date."""
+        return self.death
+
+    def set_occupation(self, occupation: str) -> None:
+        """Sets the occupation."""
+        self.occupation = sys.intern(occupation)
+
+    def get_occupation(self) -> str:
+        """Gets the occupation."""
+        return self.occupation
+
+
+class Individual(Node):
+    """An individual is always a child in a family, and is an adult in 0..* families."""
+    # Large inputs have many individuals, so avoid a per-instance __dict__. Repeated strings
+    # (names, sex, years) are interned by the setters for the same reason.
+    __slots__ = ("identifier", "famc_id", "famc", "fams_ids", "fams_list", "depth", "forename", "surname", "sex",
+                 "config")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.identifier = ""
+        self.famc_id = ""
+        self.famc: Optional[Family] = None
+        self.fams_ids: List[str] = []
+        self.fams_list: List["Family"] = []
+        self.depth = 0
+        self.forename = ""
+        self.surname = ""
+        self.sex = ""
+        self.config = IndividualConfig()
+
+    def __str__(self) -> str:
+        # Intentionally only print the famc/fams IDs, not the whole object to avoid not wanted
+        # recursion.
+        ret = "Individual(identifier=" + self.identifier
+        ret += ", famc_id: " + self.famc_id
+        ret += ", forename: " + self.forename
+        ret += ", surname: " + self.surname
+        ret += ", sex: " + self.sex
+        ret += ", fams_ids: " + str(self.fams_ids)
+        ret += ", depth: " + str(self.depth) + ")"
+        return ret
+
+    def resolve(self, graph: Graph) -> None:
+        self.famc = cast(Optional["Family"], graph.find(self.get_famc_id()))
+        for fams_id in self.fams_ids:
+            fams = graph.find(fams_id)
+            assert fams
+            self.fams_list.append(cast("Family", fams))
+
+    def get_neighbours(self, direction: str) -> List[Node]:
+        self.resolve_lazily()
+        ret: List[Node] = []
+        if self.famc and direction != "child":
+            ret.append(self.famc)
+        ret += self.fams_list
+        return ret
+
+    def get_config(self) -> IndividualConfig:
+        """Returns key-value pairs of individual."""
+        return self.config
+
+    def intern_strings(self) -> None:
+        self.set_identifier(self.identifier)
+        self.set_famc_id(self.famc_id)
+        self.fams_ids = [sys.intern(i) for i in self.fams_ids]
+        self.set_forename(self.forename)
+        self.set_surname(self.surname)
+        self.set_sex(self.sex)
+        self.config.set_birth(self.config.birth)
+        self.config.set_death(self.config.death)
+        self.config.set_occupation(self.config.occupation)
+
+    def set_identifier(self, identifier: str) -> None:
+        """Sets the ID of this individual."""
+        # Interned, so the references to this individual from families share the same string.
+        self.identifier = sys.intern(identifier)
+
+    def get_identifier(self) -> str:
+        return self.identifier
+
+    def set_sex(self, sex: str) -> None:
+        """Sets the sex of this individual."""
+        self.sex = sys.intern(sex)
+
+    def get_sex(self) -> str:
+        """Gets the sex of this individual."""
+        return self.sex
+
+    def set_forename(self, forename: str) -> None:
+        """Sets the first name of this individual."""
+        self.forename = sys.intern(forename)
+
+    def get_forename(self) -> str:
+        """Gets the first name of this individual."""
+        return self.forename
+
+    def set_surname(self, surname: str) -> None:
+        """Sets the family name of this individual."""
+        self.surname = sys.intern(surname)
+
+    def get_surname(self) -> str:
+        """Gets the family name of this individual."""
+        return self.surname
+
+    def set_depth(self, depth: int) -> None:
+        self.depth = depth
+
+    def get_depth(self) -> int:
+        return self.depth
+
+    def set_famc_id(self, famc_id: str) -> None:
+        """Sets the child family ID."""
+        self.famc_id = sys.intern(famc_id)
+
+    def get_famc_id(self) -> str:
+        """Gets the child family ID."""
+        return self.famc_id
+
+    def __get_image_path(self, image_index: imagecache.ImageIndex) -> str:
+        """Gets the path to the image."""
+        name = self.forename + " " + self.surname
+        birth = self.config.birth
+        contains = image_index.contains
+        image_name = name
+        for suffix in [".jpg", ".jpeg", ".png", ".JPG", ".PNG"]:
+            image_name += " " + birth + suffix
+            if not contains(image_name):
+                image_name = name + ".jpg"
+            if contains(image_name):
+                break
+        if contains(image_name):
+            image_path = image_index.get_path(image_name)
+        else:
+            if self.get_sex():
+                sex = self.get_sex().lower()
+            else:
+                sex = 'u'
+            image_path = get_abspath(f"placeholder-{sex}.svg")
+        return image_path
+
+    def get_label(self, image_dir: str, name_order: str, birth_format: str, basepath: str,
+                  image_index: Optional[imagecache.ImageIndex] = None) -> str:
+        """
+        Gets the graphviz label. If image_index is provided, it's used instead of looking for the
+        image in image_dir on the file system.
+        """
+        if not image_index:
+            image_index = imagecache.ImageIndex(image_dir)
+        image_path = self.__get_image_path(image_index)
+        size = image_index.sizes.get_size(image_path) if image_index.sizes else None
+        if basepath:
+            image_path = os.path.relpath(image_path, basepath)
+        label = "<table border=\"0\" cellborder=\"0\"><tr>"
+        if size:
+            # State the size of the image, so the layout doesn't depend on dot finding and probing
+            # the image. The cell has the default padding of 2 points on each side.
+            label += f"<td fixedsize=\"true\" width=\"{size[0] + 4}\" height=\"{size[1] + 4}\">"
+        else:
+            label += "<td>"
+        label += "<img scale=\"true\" src=\"" + image_path + "\"/>"
+        # State the font face explicitly to help correct centering.
+        label += "</td></tr><tr><td><font face=\"Times\">"
+        if name_order == "big":
+            # Big endian: family name first.
+            label += self.get_surname() + "<br/>"
+            label += self.get_forename() + "<br/>"
+        else:
+            # Little endian: given name first.
+            label += self.get_forename() + "<br/>"
+            label += self.get_surname() + "<br/>"
+        if self.get_config().get_birth() and not self.get_config().get_death():
+            label += birth_format.format(self.get_config().get_birth())
+        elif not self.get_config().get_birth() and self.get_config().get_death():
+            label += "† " + self.get_config().get_death()
+        else:
+            label += self.get_config().get_birth() + "-" + self.get_config().get_death()
+        occupation = self.get_config().get_occupation()
+        if occupation:
+            label += "<br/>" + occupation
+        label += "</font></td></tr></table>"
+        return label
+
+    def get_color(self) -> str:
+        """Gets the color around the node."""
+        if not self.get_sex():
+            sex = 'U'
+        else:
+            sex = self.get_sex().upper()
+        color = {'M': 'blue', 'F': 'pink', 'U': 'black'}[sex]
+        return color
+
+
+class Family(Node):
+    """Family has exactly one wife and husband, 0..* children."""
+    __slots__ = ("identifier", "marr", "wife_id", "wife", "husb_id", "husb", "child_ids", "child_list", "depth")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.identifier = ""
+        self.marr = ""
+        self.wife_id = ""
+        self.wife: Optional["Individual"] = None
+        self.husb_id = ""
+        self.husb: Optional["Individual"] = None
+        self.child_ids: List[str] = []
+        self.child_list: List["Individual"] = []
+        self.depth = 0
+
+    def __str__(self) -> str:
+        # Intentionally only print the wife/husband/child IDs, not the whole object to avoid not
+        # wanted recursion.
+        ret = "Family(identifier=" + self.identifier
+        ret += ", marr: " + self.marr
+        ret += ", wife_id: " + self.wife_id
+        ret += ", husb_id: " + self.husb_id
+        ret += ", child_ids: " + str(self.child_ids)
+        ret += ", depth: " + str(self.depth) + ")"
+        return ret
+
+    def resolve(self, graph: Graph) -> None:
+        self.wife = cast(Optional["Individual"], graph.find(self.get_wife_id()))
+        self.husb = cast(Optional["Individual"], graph.find(self.get_husb_id()))
+        for child_id in self.child_ids:
+            child = graph.find(child_id)
+            assert child
+            self.child_list.append(cast("Individual", child))
+
+    def get_neighbours(self, direction: str) -> List[Node]:
+        self.resolve_lazily()
+        ret: List[Node] = []
+        if self.wife:
+            ret.append(self.wife)
+        if self.husb:
+            ret.append(self.husb)
+        ret += self.child_list
+        return ret
+
+    def intern_strings(self) -> None:
+        self.set_identifier(self.identifier)
+        self.set_marr(self.marr)
+        self.set_wife_id(self.wife_id)
+        self.set_husb_id(self.husb_id)
+        self.child_ids = [sys.intern(i) for i in self.child_ids]
+
+    def set_identifier(self, identifier: str) -> None:
+        """Sets the ID of this family."""
+        # Interned, so the references to this family from individuals share the same string.
+        self.identifier = sys.intern(identifier)
+
+    def get_identifier(self) -> str:
+        return self.identifier
+
+    def set_marr(self, marr: str) -> None:
+        """Sets the marriage date."""
+        self.marr = sys.intern(marr)
+
+    def get_marr(self) -> str:
+        """Gets the marriage date."""
+        return self.marr
+
+    def set_depth(self, depth: int) -> None:
+        self.depth = depth
+
+    def get_depth(self) -> int:
+        return self.depth
+
+    def set_wife_id(self, wife_id: str) -> None:
+        """Sets the wife ID of this family."""
+        self.wife_id = sys.intern(wife_id)
+
+    def get_wife_id(self) -> str:
+        """Gets the wife ID of this family."""
+        return self.wife_id
+
+    def set_husb_id(self, husb_id: str) -> None:
+        """Sets the husband ID of this family."""
+        self.husb_id = sys.intern(husb_id)
+
+    def get_husb_id(self) -> str:
+        """Gets the husband ID of this family."""
+        return self.husb_id
+
+
+class CsrGraph(Graph):  # pylint: disable=too-many-instance-attributes
+    """
+    A graph for large inputs: nodes are stored as columns, and references between them are
+    stored as compressed sparse row arrays of node positions (the order in the input). Node
+    objects are only created when a node is looked up, and their neighbours are only resolved
+    when the node is visited, so only the traversed subgraph is materialised.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.identifiers: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.is_family = bytearray()
+        # Individual columns.
+        self.forenames: List[str] = []
+        self.surnames: List[str] = []
+        self.sexes: List[str] = []
+        self.births: List[str] = []
+        self.deaths: List[str] = []
+        self.occupations: List[str] = []
+        self.notes: List[str] = []
+        # Family columns.
+        self.marrs: List[str] = []
+        # References, -1 means none.
+        self.famc = array.array("i")
+        self.husb = array.array("i")
+        self.wife = array.array("i")
+        # Neighbours of node N are at [offsets[N], offsets[N + 1]).
+        self.fams_offsets = array.array("i", [0])
+        self.fams = array.array("i")
+        self.child_offsets = array.array("i", [0])
+        self.children = array.array("i")
+        self.materialized: Dict[int, Node] = {}
+        # String IDs of references, until resolve() turns them into positions.
+        self.__single_ids: List[str] = []
+        self.__fams_ids: List[str] = []
+        self.__child_ids: List[str] = []
+
+    def __iter__(self) -> Iterator[Node]:
+        for position in range(len(self.identifiers)):
+            yield self.get_node(position)
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
+
+    def append(self, node: Node) -> None:
+        identifier = node.get_identifier()
+        self.positions.setdefault(identifier, len(self.identifiers))
+        self.identifiers.append(identifier)
+        if isinstance(node, Individual):
+            self.is_family.append(0)
+            config = node.get_config()
+            self.forenames.append(node.get_forename())
+            self.surnames.append(node.get_surname())
+            self.sexes.append(node.get_sex())
+            self.births.append(config.get_birth())
+            self.deaths.append(config.get_death())
+            self.occupations.append(config.get_occupation())
+            self.notes.append(config.get_note())
+            self.marrs.append("")
+            self.__single_ids += [node.get_famc_id(), "", ""]
+            self.__fams_ids += node.fams_ids
+        else:
+            family = cast(Family, node)
+            self.is_family.append(1)
+            for column in (self.forenames, self.surnames, self.sexes, self.births, self.deaths, self.occupations,
+                           self.notes):
+                column.append("")
+            self.marrs.append(family.get_marr())
+            self.__single_ids += ["", family.get_husb_id(), family.get_wife_id()]
+            self.__child_ids += family.child_ids
+        self.fams_offsets.append(len(self.__fams_ids))
+        self.child_offsets.append(len(self.__child_ids))
+
+    def __to_positions(self, identifiers: List[str]) -> "array.array[int]":
+        return array.array("i", [self.positions.get(i, -1) if i else -1 for i in identifiers])
+
+    def resolve(self, lazy: bool = False) -> None:
+        """Turns the string IDs of references into positions. Nodes are always resolved lazily."""
+        singles = self.__to_positions(self.__single_ids)
+        self.famc = singles[0::3]
+        self.husb = singles[1::3]
+        self.wife = singles[2::3]
+        self.fams = self.__to_positions(self.__fams_ids)
+        self.children = self.__to_positions(self.__child_ids)
+        assert -1 not in self.fams and -1 not in self.children
+        self.__single_ids = []
+        self.__fams_ids = []
+        self.__child_ids = []
+
+    def to_tuple(self) -> Any:
+        """Gets the columns of a resolved graph as builtin types, which can be marshalled."""
+        arrays = [self.famc, self.husb, self.wife, self.fams_offsets, self.fams, self.child_offsets, self.children]
+        return (self.identifiers, self.positions, bytes(self.is_family), self.forenames, self.surnames, self.sexes,
+                self.births, self.deaths, self.occupations, self.notes, self.marrs, [i.tobytes() for i in arrays])
+
+    @staticmethod
+    def from_tuple(columns: Any) -> "CsrGraph":
+        """Creates a resolved graph from the output of to_tuple()."""
+        graph = CsrGraph()
+        (graph.identifiers, graph.positions, is_family, graph.forenames, graph.surnames, graph.sexes, graph.births,
+         graph.deaths, graph.occupations, graph.notes, graph.marrs, arrays) = columns
+        graph.is_family = bytearray(is_family)
+        graph.famc, graph.husb, graph.wife, graph.fams_offsets, graph.fams, graph.child_offsets, graph.children = [
+            array.array("i", i) for i in arrays]
+        return graph
+
+    def to_graph(self, lazy: bool = False) -> Graph:
+        """Creates node objects for all nodes and resolves them."""
+        graph = Graph()
+        for node in self:
+            node.lazy_graph = None
+            graph.append(node)
+        graph.resolve(lazy)
+        return graph
+
+    def find(self, identifier: str) -> Optional[Node]:
+        if not identifier or identifier not in self.positions:
+            return None
+        return self.get_node(self.positions[identifier])
+
+    def get_family_ids(self) -> List[str]:
+        """Gets the identifiers of all families, in the order of the input."""
+        return [identifier for identifier, is_family in zip(self.identifiers, self.is_family) if is_family]
+
+    def get_node(self, position: int) -> Node:
+        """Gets the node at a position, creating the node object on first use."""
+        node = self.materialized.get(position)
+        if node is None:
+            node = self.__materialize(position)
+            self.materialized[position] = node
+        return node
+
+    def __get_identifier(self, position: int) -> str:
+        if position < 0:
+            return ""
+        return self.identifiers[position]
+
+    def __materialize(self, position: int) -> Node:
+        node: Node
+        if self.is_family[position]:
+            family = Family()
+            family.set_identifier(self.identifiers[position])
+            family.set_marr(self.marrs[position])
+            family.set_husb_id(self.__get_identifier(self.husb[position]))
+            family.set_wife_id(self.__get_identifier(self.wife[position]))
+            children = self.children[self.child_offsets[position]:self.child_offsets[position + 1]]
+            family.child_ids = [self.identifiers[i] for i in children]
+            node = family
+        else:
+            individual = Individual()
+            individual.set_identifier(self.identifiers[position])
+            individual.set_forename(self.forenames[position])
+            individual.set_surname(self.surnames[position])
+            individual.set_sex(self.sexes[position])
+            config = individual.get_config()
+            config.set_birth(self.births[position])
+            config.set_death(self.deaths[position])
+            config.set_occupation(self.occupations[position])
+            config.set_note(self.notes[position])
+            individual.set_famc_id(self.__get_identifier(self.famc[position]))
+            fams = self.fams[self.fams_offsets[position]:self.fams_offsets[position + 1]]
+            individual.fams_ids = [self.identifiers[i] for i in fams]
+            node = individual
+        node.lazy_graph = self
+        return node
+
+
+def to_csr_graph(graph: Graph) -> CsrGraph:
+    """Converts a graph to a resolved CsrGraph, unless it's one already."""
+    if isinstance(graph, CsrGraph):
+        return graph
+    csr_graph = CsrGraph()
+    for node in graph:
+        csr_graph.append(node)
+    csr_graph.resolve()
+    return csr_graph
+
+
+def bfs(root: Node, config: Dict[str, str]) -> List[Node]:
+    """
+    Does a breadth first search traversal of the graph, from root. Returns the traversed nodes.
+    """
+    # The root may have a depth from a previous traversal of the same graph.
+    root.set_depth(0)
+    visited = {root}
+    queue = collections.deque([root])
+    ret: List[Node] = []
+
+    direction = config.get("direction", "both")
+    # Every 2nd node is a family + the root is always a family.
+    max_depth = int(config["familydepth"]) * 2 + 1
+    while queue:
+        node = queue.popleft()
+        depth = node.get_depth()
+        if depth > max_depth:
+            return ret
+        ret.append(node)
+        for neighbour in node.get_neighbours(direction):
+            if neighbour not in visited:
+                neighbour.set_depth(depth + 1)
+                visited.add(neighbour)
+                queue.append(neighbour)
+
+    return ret
+
+
+class SubgraphIndex:
+    """
+    Answers which nodes are within a familydepth of a family without traversing the graph again,
+    and without changing the depth of nodes. The nodes around each family are stored in breadth
+    first order up to max_family_depth, so the subgraph for a smaller familydepth is a prefix of
+    them. This costs 4 bytes per node per family it is near to, deeper queries or other directions
+    traverse the compact graph instead.
+    """
+    def __init__(self, graph: CsrGraph, max_family_depth: int, direction: str = "both") -> None:
+        self.graph = graph
+        self.max_family_depth = max_family_depth
+        self.direction = direction
+        # Family position -> its index in offsets.
+        self.families: Dict[int, int] = {}
+        # The nodes around the Nth family are at nodes[offsets[N]:offsets[N + 1]], the ones within
+        # familydepth D end at ends[N * (max_family_depth + 1) + D].
+        self.offsets = array.array("q", [0])
+        self.nodes = array.array("i")
+        self.ends = array.array("q")
+        for position, is_family in enumerate(graph.is_family):
+            if not is_family:
+                continue
+            self.families[position] = len(self.families)
+            self.ends.extend(self.__traverse(position, max_family_depth, direction, self.nodes))
+            self.offsets.append(len(self.nodes))
+
+    def __traverse(self, root: int, family_depth: int, direction: str, ret: "array.array[int]") -> List[int]:
+        """
+        Appends the positions of the nodes within family_depth of root to ret, in the same order as
+        bfs(). Returns the length of ret after each familydepth.
+        """
+        graph = self.graph
+        famc = graph.famc if direction != "child" else None
+        visited = {root}
+        layer = [root]
+        ends: List[int] = []
+        # Every 2nd layer is a family + the root is always a family.
+        for depth in range(family_depth * 2 + 2):
+            ret.extend(layer)
+            if depth % 2:
+                ends.append(len(ret))
+            next_layer: List[int] = []
+            for position in layer:
+                if graph.is_family[position]:
+                    neighbours = [graph.wife[position], graph.husb[position]]
+                    neighbours += graph.children[graph.child_offsets[position]:graph.child_offsets[position + 1]]
+                else:
+                    neighbours = [famc[position]] if famc is not None else []
+                    neighbours += graph.fams[graph.fams_offsets[position]:graph.fams_offsets[position + 1]]
+                for neighbour in neighbours:
+                    if neighbour >= 0 and neighbour not in visited:
+                        visited.add(neighbour)
+                        next_layer.append(neighbour)
+            layer = next_layer
+        return ends
+
+    def get_size(self) -> int:
+        """Gets the memory used by the index in bytes, not counting the graph."""
+        arrays = (self.offsets, self.nodes, self.ends)
+        return sum(len(i) * i.itemsize for i in arrays) + sys.getsizeof(self.families)
+
+    def get_subgraph(self, root_family: str, config: Dict[str, str]) -> List[Node]:
+        """Same as bfs() from root_family, the 'familydepth' and 'direction' of config are used."""
+        root = self.graph.positions.get(root_family, -1)
+        if root not in self.families:
+            raise Ged2DotException(f"Root family '{root_family}' is not found.")
+        family_depth = int(config["familydepth"])
+        if family_depth <= self.max_family_depth and config.get("direction", "both") == self.direction:
+            index = self.families[root]
+            start = self.offsets[index]
+            end = self.ends[index * (self.max_family_depth + 1) + family_depth]
+            positions = self.nodes[start:end]
+        else:
+            positions = array.array("i")
+            self.__traverse(root, family_depth, config.get("direction", "both"), positions)
+        nodes = [self.graph.get_node(i) for i in positions]
+        # The export reads the wife, husband and children of families, so resolve them.
+        for node in nodes:
+            node.resolve_lazily()
+        return nodes
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab:
@@ -7,22 +7,44 @@
 
 """A version of ged2dot that uses breadth-first search to traverse the gedcom graph."""
 
+from typing import Any
 from typing import BinaryIO
+from typing import Callable
 from typing import Dict
+from typing import Generator
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
-from typing import cast
+from typing import Tuple
+from typing import Union
 import argparse
+import collections
+import concurrent.futures
 import configparser
+import functools
+import glob
+import http.server
+import importlib.util
+import io
 import os
+import subprocess
 import sys
+import threading
+import urllib.parse
 
+import familytree
+import graphcache
+import imagecache
+import inlineize
+import rendercache
 
-class Ged2DotException(Exception):
-    """An exception that is intentionally raised by ged2dot."""
 
+# Defined next to the graph, which raises it as well.
+Ged2DotException = familytree.Ged2DotException
 
-class Config:
+
+class Config:  # pylint: disable=too-many-instance-attributes
     """Stores options from a config file or from cmdline args."""
     def __init__(self) -> None:
         self.input = "-"
@@ -36,6 +58,16 @@ class Config:
         self.direction = "both"
         self.birthformat = "{}-"
         self.relpath = "false"
+        self.backend = "objects"
+        self.cachedir = ""
+        self.jobs = "1"
+        self.rootfamilies = ""
+        self.format = "dot"
+        self.inline = "false"
+        self.rendercachesize = "100"
+        self.serve = ""
+        self.thumbnailsize = ""
+        self.imagesizes = "false"
 
     def read_config(self, config_file: str) -> None:
         """Reads config from a provided file."""
@@ -51,24 +83,18 @@ class Config:
 
     def read_args(self, args: argparse.Namespace) -> None:
         """Reads config from cmdline args."""
-        if args.input:
-            self.input = args.input
-        if args.output:
-            self.output = args.output
-        if args.rootfamily:
-            self.rootfamily = args.rootfamily
-        if args.familydepth:
-            self.familydepth = args.familydepth
-        if args.imagedir:
-            self.imagedir = args.imagedir
-        if args.nameorder:
-            self.nameorder = args.nameorder
-        if args.direction:
-            self.direction = args.direction
-        if args.birthformat:
-            self.birthformat = args.birthformat
+        for option in ["input", "output", "rootfamily", "familydepth", "imagedir", "nameorder", "direction",
+                       "birthformat", "backend", "cachedir", "jobs", "rootfamilies", "format", "rendercachesize",
+                       "serve", "thumbnailsize"]:
+            value = getattr(args, option)
+            if value:
+                setattr(self, option, value)
         if args.relpath:
             self.relpath = "true"
+        if args.inline:
+            self.inline = "true"
+        if args.imagesizes:
+            self.imagesizes = "true"
 
     def get_dict(self) -> Dict[str, str]:
         """Gets the config as a dict."""
@@ -82,60 +108,44 @@ class Config:
             "direction": self.direction,
             "birthformat": self.birthformat,
             "relpath": self.relpath,
+            "backend": self.backend,
+            "cachedir": self.cachedir,
+            "jobs": self.jobs,
+            "rootfamilies": self.rootfamilies,
+            "format": self.format,
+            "inline": self.inline,
+            "rendercachesize": self.rendercachesize,
+            "serve": self.serve,
+            "thumbnailsize": self.thumbnailsize,
+            "imagesizes": self.imagesizes,
         }
         return config
 
 
-class Node:
-    """Base class for an individual or family."""
-    def get_identifier(self) -> str:  # pragma: no cover
-        """Gets the ID of this node."""
-        return str()
-
-    def set_depth(self, depth: int) -> None:  # pragma: no cover
-        """Set the depth of this node, during one graph traversal."""
-        # pylint: disable=unused-argument
-
-    def get_depth(self) -> int:  # pragma: no cover
-        """Get the depth of this node, during one graph traversal."""
-        return 0
-
-    def get_neighbours(self, direction: str) -> List["Node"]:  # pragma: no cover
-        """Get the neighbour nodes of this node."""
-        return []
-
-    def resolve(self, graph: List["Node"]) -> None:  # pragma: no cover
-        """Resolve string IDs to node objects."""
-        # pylint: disable=unused-argument
-
-
-def graph_find(graph: List[Node], identifier: str) -> Optional[Node]:
-    """Find identifier in graph."""
-    if not identifier:
-        return None
-
-    results = [node for node in graph if node.get_identifier() == identifier]
-    if not results:
-        return None
-
-    assert len(results) == 1
-    return results[0]
-
-
-def get_abspath(path: str) -> str:
-    """Make a path absolute, taking the repo root as a base dir."""
-    if os.path.isabs(path):
-        return path
-
-    return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
-
-
-def get_data_abspath(gedcom: str, path: str) -> str:
-    """Make a path absolute, taking the gedcom file's dir as a base dir."""
-    if os.path.isabs(path):
-        return path
-
-    return os.path.join(os.path.dirname(os.path.realpath(gedcom)), path)
+def iter_lines(stream: BinaryIO, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    Reads a stream in fixed-size chunks and yields its lines, without their line endings. Lines
+    are split at \r\n in case the chunks read until the first \n contain a \r, otherwise at \n, so
+    that a lone \n inside a \r\n-terminated line is kept.
+    """
+    separator = b""
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buf = pending + chunk
+        if not separator:
+            if b"\n" not in buf:
+                pending = buf
+                continue
+            separator = b"\r\n" if b"\r" in buf else b"\n"
+        lines = buf.split(separator)
+        # The last line may continue in the next chunk.
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
 
 
 def to_bytes(string: str) -> bytes:
@@ -143,286 +153,40 @@ def to_bytes(string: str) -> bytes:
     return string.encode("utf-8")
 
 
-class IndividualConfig:
-    """Key-value pairs on an individual."""
-    def __init__(self) -> None:
-        self.__note = ""
-        self.__birth = ""
-        self.__death = ""
-        self.__occupation = ""
-
-    def set_note(self, note: str) -> None:
-        """Sets a note."""
-        self.__note = note
-
-    def get_note(self) -> str:
-        """Gets a note."""
-        return self.__note
-
-    def set_birth(self, birth: str) -> None:
-        """Sets the birth date."""
-        self.__birth = birth
-
-    def get_birth(self) -> str:
-        """Gets the birth date."""
-        return self.__birth
-
-    def set_death(self, death: str) -> None:
-        """Sets the death date."""
-        self.__death = death
-
-    def get_death(self) -> str:
-        """Gets the death date."""
-        return self.__death
-
-    def set_occupation(self, occupation: str) -> None:
-        """Sets the occupation."""
-        self.__occupation = occupation
-
-    def get_occupation(self) -> str:
-        """Gets the occupation."""
-        return self.__occupation
-
-
-class Individual(Node):
-    """An individual is always a child in a family, and is an adult in 0..* families."""
-    def __init__(self) -> None:
-        self.__dict: Dict[str, str] = {}
-        self.__dict["identifier"] = ""
-        self.__dict["famc_id"] = ""
-        self.famc: Optional[Family] = None
-        self.fams_ids: List[str] = []
-        self.fams_list: List["Family"] = []
-        self.depth = 0
-        self.__dict["forename"] = ""
-        self.__dict["surname"] = ""
-        self.__dict["sex"] = ""
-        self.__config = IndividualConfig()
-
-    def __str__(self) -> str:
-        # Intentionally only print the famc/fams IDs, not the whole object to avoid not wanted
-        # recursion.
-        ret = "Individual(__dict=" + str(self.__dict)
-        ret += ", fams_ids: " + str(self.fams_ids)
-        ret += ", depth: " + str(self.depth) + ")"
-        return ret
-
-    def resolve(self, graph: List[Node]) -> None:
-        self.famc = cast(Optional["Family"], graph_find(graph, self.get_famc_id()))
-        for fams_id in self.fams_ids:
-            fams = graph_find(graph, fams_id)
-            assert fams
-            self.fams_list.append(cast("Family", fams))
-
-    def get_neighbours(self, direction: str) -> List[Node]:
-        ret: List[Node] = []
-        if self.famc and direction != "child":
-            ret.append(self.famc)
-        ret += self.fams_list
-        return ret
-
-    def get_config(self) -> IndividualConfig:
-        """Returns key-value pairs of individual."""
-        return self.__config
-
-    def set_identifier(self, identifier: str) -> None:
-        """Sets the ID of this individual."""
-        self.__dict["identifier"] = identifier
-
-    def get_identifier(self) -> str:
-        return self.__dict["identifier"]
-
-    def set_sex(self, sex: str) -> None:
-        """Sets the sex of this individual."""
-        self.__dict["sex"] = sex
-
-    def get_sex(self) -> str:
-        """Gets the sex of this individual."""
-        return self.__dict["sex"]
-
-    def set_forename(self, forename: str) -> None:
-        """Sets the first name of this individual."""
-        self.__dict["forename"] = forename
-
-    def get_forename(self) -> str:
-        """Gets the first name of this individual."""
-        return self.__dict["forename"]
-
-    def set_surname(self, surname: str) -> None:
-        """Sets the family name of this individual."""
-        self.__dict["surname"] = surname
-
-    def get_surname(self) -> str:
-        """Gets the family name of this individual."""
-        return self.__dict["surname"]
-
-    def set_depth(self, depth: int) -> None:
-        self.depth = depth
-
-    def get_depth(self) -> int:
-        return self.depth
-
-    def set_famc_id(self, famc_id: str) -> None:
-        """Sets the child family ID."""
-        self.__dict["famc_id"] = famc_id
-
-    def get_famc_id(self) -> str:
-        """Gets the child family ID."""
-        return self.__dict["famc_id"]
-
-    def __get_image_path(self, image_dir: str, basepath: str) -> str:
-        """Gets the path to the image."""
-        image_path = os.path.join(image_dir, self.get_forename() + " " + self.get_surname())
-        for suffix in [".jpg", ".jpeg", ".png", ".JPG", ".PNG"]:
-            image_path += " " + self.get_config().get_birth() + suffix
-            if not os.path.exists(to_bytes(image_path)):
-                image_path = os.path.join(image_dir, self.get_forename() + " " + self.get_surname()) \
-                    + ".jpg"
-            if os.path.exists(to_bytes(image_path)):
-                break
-        if not os.path.exists(to_bytes(image_path)):
-            if self.get_sex():
-                sex = self.get_sex().lower()
-            else:
-                sex = 'u'
-            image_path = get_abspath(f"placeholder-{sex}.svg")
-        if basepath:
-            image_path = os.path.relpath(image_path, basepath)
-        return image_path
-
-    def get_label(self, image_dir: str, name_order: str, birth_format: str, basepath: str) -> str:
-        """Gets the graphviz label."""
-        image_path = self.__get_image_path(image_dir, basepath)
-        label = "<table border=\"0\" cellborder=\"0\"><tr><td>"
-        label += "<img scale=\"true\" src=\"" + image_path + "\"/>"
-        # State the font face explicitly to help correct centering.
-        label += "</td></tr><tr><td><font face=\"Times\">"
-        if name_order == "big":
-            # Big endian: family name first.
-            label += self.get_surname() + "<br/>"
-            label += self.get_forename() + "<br/>"
-        else:
-            # Little endian: given name first.
-            label += self.get_forename() + "<br/>"
-            label += self.get_surname() + "<br/>"
-        if self.get_config().get_birth() and not self.get_config().get_death():
-            label += birth_format.format(self.get_config().get_birth())
-        elif not self.get_config().get_birth() and self.get_config().get_death():
-            label += "† " + self.get_config().get_death()
-        else:
-            label += self.get_config().get_birth() + "-" + self.get_config().get_death()
-        occupation = self.get_config().get_occupation()
-        if occupation:
-            label += "<br/>" + occupation
-        label += "</font></td></tr></table>"
-        return label
-
-    def get_color(self) -> str:
-        """Gets the color around the node."""
-        if not self.get_sex():
-            sex = 'U'
-        else:
-            sex = self.get_sex().upper()
-        color = {'M': 'blue', 'F': 'pink', 'U': 'black'}[sex]
-        return color
-
-
-class Family(Node):
-    """Family has exactly one wife and husband, 0..* children."""
-    def __init__(self) -> None:
-        self.__dict: Dict[str, str] = {}
-        self.__dict["identifier"] = ""
-        self.__dict["marr"] = ""
-        self.__dict["wife_id"] = ""
-        self.wife: Optional["Individual"] = None
-        self.__dict["husb_id"] = ""
-        self.husb: Optional["Individual"] = None
-        self.child_ids: List[str] = []
-        self.child_list: List["Individual"] = []
-        self.depth = 0
-
-    def __str__(self) -> str:
-        # Intentionally only print the wife/husband/child IDs, not the whole object to avoid not
-        # wanted recursion.
-        ret = "Family(__dict=" + str(self.__dict)
-        ret += ", child_ids: " + str(self.child_ids)
-        ret += ", depth: " + str(self.depth) + ")"
-        return ret
-
-    def resolve(self, graph: List[Node]) -> None:
-        self.wife = cast(Optional["Individual"], graph_find(graph, self.get_wife_id()))
-        self.husb = cast(Optional["Individual"], graph_find(graph, self.get_husb_id()))
-        for child_id in self.child_ids:
-            child = graph_find(graph, child_id)
-            assert child
-            self.child_list.append(cast("Individual", child))
-
-    def get_neighbours(self, direction: str) -> List[Node]:
-        ret: List[Node] = []
-        if self.wife:
-            ret.append(self.wife)
-        if self.husb:
-            ret.append(self.husb)
-        ret += self.child_list
-        return ret
-
-    def set_identifier(self, identifier: str) -> None:
-        """Sets the ID of this family."""
-        self.__dict["identifier"] = identifier
-
-    def get_identifier(self) -> str:
-        return self.__dict["identifier"]
-
-    def set_marr(self, marr: str) -> None:
-        """Sets the marriage date."""
-        self.__dict["marr"] = marr
-
-    def get_marr(self) -> str:
-        """Gets the marriage date."""
-        return self.__dict["marr"]
-
-    def set_depth(self, depth: int) -> None:
-        self.depth = depth
-
-    def get_depth(self) -> int:
-        return self.depth
-
-    def set_wife_id(self, wife_id: str) -> None:
-        """Sets the wife ID of this family."""
-        self.__dict["wife_id"] = wife_id
-
-    def get_wife_id(self) -> str:
-        """Gets the wife ID of this family."""
-        return self.__dict["wife_id"]
-
-    def set_husb_id(self, husb_id: str) -> None:
-        """Sets the husband ID of this family."""
-        self.__dict["husb_id"] = husb_id
-
-    def get_husb_id(self) -> str:
-        """Gets the husband ID of this family."""
-        return self.__dict["husb_id"]
-
-
 class GedcomImport:
     """Builds the graph from GEDCOM."""
     def __init__(self) -> None:
-        self.individual: Optional[Individual] = None
-        self.family: Optional[Family] = None
-        self.graph: List[Node] = []
+        self.individual: Optional[familytree.Individual] = None
+        self.family: Optional[familytree.Family] = None
+        self.graph = familytree.Graph()
         self.in_birt = False
         self.in_deat = False
         self.in_marr = False
+        # Level 1 tags we care about, the handler gets the value after the tag. Other tags are
+        # ignored without decoding them.
+        self.__level1_handlers: Dict[bytes, Callable[[bytes], None]] = {
+            b"SEX": self.__handle_sex,
+            b"NAME": self.__handle_name,
+            b"FAMC": self.__handle_famc,
+            b"FAMS": self.__handle_fams,
+            b"HUSB": self.__handle_husb,
+            b"WIFE": self.__handle_wife,
+            b"CHIL": self.__handle_chil,
+            b"MARR": self.__handle_marr,
+            b"BIRT": self.__handle_birt,
+            b"DEAT": self.__handle_deat,
+            b"NOTE": self.__handle_note,
+            b"OCCU": self.__handle_occu,
+        }
 
     def __reset_flags(self) -> None:
-        if self.in_birt:
-            self.in_birt = False
-        elif self.in_deat:
-            self.in_deat = False
-        elif self.in_marr:
-            self.in_marr = False
-
-    def __handle_level0(self, line: str) -> None:
+        self.in_birt = False
+        self.in_deat = False
+        self.in_marr = False
+
+    def __handle_level0(self, line: bytes) -> None:
+        # A new record starts, don't apply dates to it based on the previous record.
+        self.__reset_flags()
         if self.individual:
             self.graph.append(self.individual)
             self.individual = None
@@ -430,12 +194,13 @@ class GedcomImport:
             self.graph.append(self.family)
             self.family = None
 
-        if line.startswith("@") and line.endswith("INDI"):
-            self.individual = Individual()
-            self.individual.set_identifier(line[1:-6])
-        elif line.startswith("@") and line.endswith("FAM"):
-            self.family = Family()
-            self.family.set_identifier(line[1:-5])
+        # Only the identifiers of individuals and families are decoded.
+        if line.startswith(b"@") and line.endswith(b"INDI"):
+            self.individual = familytree.Individual()
+            self.individual.set_identifier(safe_utf8_decode(line[1:-6]))
+        elif line.startswith(b"@") and line.endswith(b"FAM"):
+            self.family = familytree.Family()
+            self.family.set_identifier(safe_utf8_decode(line[1:-5]))
 
     def __handle_indi_name(self, line: str) -> None:
         # Expected style: 'first /last/ suffix', suffix is optional.
@@ -450,125 +215,208 @@ class GedcomImport:
             suffix = tokens[2].strip()
             self.individual.set_surname(f"{surname} {suffix}")
 
-    def __handle_level1(self, line: str) -> None:
-        self.__reset_flags()
+    def __handle_sex(self, value: bytes) -> None:
+        if self.individual and value:
+            self.individual.set_sex(safe_utf8_decode(value.partition(b" ")[0]))
+
+    def __handle_name(self, value: bytes) -> None:
+        if self.individual:
+            self.__handle_indi_name(safe_utf8_decode(value))
+
+    def __handle_famc(self, value: bytes) -> None:
+        # At least <https://www.ancestry.com> sometimes writes multiple FAMC, which doesn't make
+        # sense. Import only the first one.
+        if self.individual and not self.individual.get_famc_id():
+            self.individual.set_famc_id(safe_utf8_decode(value)[1:-1])
+
+    def __handle_fams(self, value: bytes) -> None:
+        if self.individual:
+            self.individual.fams_ids.append(sys.intern(safe_utf8_decode(value)[1:-1]))
+
+    def __handle_husb(self, value: bytes) -> None:
+        if self.family:
+            self.family.set_husb_id(safe_utf8_decode(value)[1:-1])
 
-        line_lead_token = line.split(' ')[0]
-
-        if line_lead_token == "SEX" and self.individual:
-            tokens = line.split(' ')
-            if len(tokens) > 1:
-                self.individual.set_sex(tokens[1])
-        elif line_lead_token == "NAME" and self.individual:
-            line = line[5:]
-            self.__handle_indi_name(line)
-        elif line_lead_token == "FAMC" and self.individual:
-            # At least <https://www.ancestry.com> sometimes writes multiple FAMC, which doesn't
-            # make sense. Import only the first one.
-            if not self.individual.get_famc_id():
-                self.individual.set_famc_id(line[6:-1])
-        elif line_lead_token == "FAMS" and self.individual:
-            self.individual.fams_ids.append(line[6:-1])
-        elif line_lead_token == "HUSB" and self.family:
-            self.family.set_husb_id(line[6:-1])
-        elif line_lead_token == "WIFE" and self.family:
-            self.family.set_wife_id(line[6:-1])
-        elif line_lead_token == "CHIL" and self.family:
-            self.family.child_ids.append(line[6:-1])
-        elif line_lead_token == "MARR" and self.family:
+    def __handle_wife(self, value: bytes) -> None:
+        if self.family:
+            self.family.set_wife_id(safe_utf8_decode(value)[1:-1])
+
+    def __handle_chil(self, value: bytes) -> None:
+        if self.family:
+            self.family.child_ids.append(sys.intern(safe_utf8_decode(value)[1:-1]))
+
+    def __handle_marr(self, _value: bytes) -> None:
+        if self.family:
             self.in_marr = True
-        else:
-            self.__handle_individual_config(line)
-
-    def __handle_individual_config(self, line: str) -> None:
-        """Handles fields stored in individual.get_config()."""
-        line_lead_token = line.split(' ')[0]
-
-        if line_lead_token == "BIRT":
-            self.in_birt = True
-        elif line_lead_token == "DEAT":
-            self.in_deat = True
-        elif line_lead_token == "NOTE" and self.individual:
-            self.individual.get_config().set_note(line[5:])
-        elif line_lead_token == "OCCU" and self.individual:
-            self.individual.get_config().set_occupation(line[5:])
-
-    def load(self, config: Dict[str, str]) -> List[Node]:
-        """Tokenizes and resolves a gedcom file into a graph."""
+
+    def __handle_birt(self, _value: bytes) -> None:
+        self.in_birt = True
+
+    def __handle_deat(self, _value: bytes) -> None:
+        self.in_deat = True
+
+    def __handle_note(self, value: bytes) -> None:
+        if self.individual:
+            self.individual.get_config().set_note(safe_utf8_decode(value))
+
+    def __handle_occu(self, value: bytes) -> None:
+        if self.individual:
+            self.individual.get_config().set_occupation(safe_utf8_decode(value))
+
+    def __handle_date(self, line: bytes) -> None:
+        if self.individual:
+            if self.in_birt:
+                self.individual.get_config().set_birth(safe_utf8_decode(line.rsplit(b" ", maxsplit=1)[-1]))
+            elif self.in_deat:
+                self.individual.get_config().set_death(safe_utf8_decode(line.rsplit(b" ", maxsplit=1)[-1]))
+        elif self.family and self.in_marr:
+            self.family.set_marr(safe_utf8_decode(line.rsplit(b" ", maxsplit=1)[-1]))
+
+    def load(self, config: Dict[str, str], lazy: bool = False) -> familytree.Graph:
+        """
+        Tokenizes and resolves a gedcom file into a graph, or loads it from the cache. If lazy is
+        true, nodes are only resolved when a traversal visits them, which is faster when only a
+        small part of the graph is visited.
+        """
+        cache: Optional[graphcache.GraphCache] = None
+        if config.get("cachedir", "") and config["input"] != "-":
+            cache = graphcache.GraphCache(config)
+            csr_graph = cache.load()
+            if csr_graph:
+                if config.get("backend", "objects") == "csr":
+                    return csr_graph
+                return csr_graph.to_graph(lazy)
+
         graph = self.tokenize(config)
-        for node in graph:
-            node.resolve(graph)
+        graph.resolve(lazy)
+        if cache:
+            cache.store(graph)
         return graph
 
-    def tokenize(self, config: Dict[str, str]) -> List[Node]:
+    def tokenize(self, config: Dict[str, str]) -> familytree.Graph:
         """Tokenizes a gedcom file into a graph."""
+        if config.get("backend", "objects") == "csr":
+            self.graph = familytree.CsrGraph()
+        jobs = safe_atoi(config.get("jobs", "1"))
         if config["input"] == "-":
             return self.tokenize_from_stream(sys.stdin.buffer)
         with open(config["input"], "rb") as stream:
+            if jobs > 1:
+                return self.tokenize_parallel(stream, jobs)
             return self.tokenize_from_stream(stream)
 
-    def tokenize_from_stream(self, stream: BinaryIO) -> List[Node]:
-        """Tokenizes a gedcom stream into a graph."""
-        stream_buf = stream.read()
-        lines = stream_buf.split(b"\r\n")
-        if b"\r" not in stream_buf:
-            lines = stream_buf.split(b"\n")
-        for line_bytes in lines:
-            line = safe_utf8_decode(line_bytes.strip())
+    def tokenize_from_stream(self, stream: BinaryIO, chunk_size: int = 1024 * 1024) -> familytree.Graph:
+        """Tokenizes a gedcom stream into a graph, reading it chunk by chunk."""
+        return self.tokenize_lines(iter_lines(stream, chunk_size))
+
+    def tokenize_parallel(self, stream: BinaryIO, jobs: int, chunk_size: int = 16 * 1024 * 1024) -> familytree.Graph:
+        """
+        Tokenizes a gedcom stream into a graph, using multiple processes. The stream is split into
+        chunks at record boundaries and the nodes from the chunks are added in the input order, so
+        the result is the same as with tokenize_from_stream(). At most 2 chunks per process are read
+        ahead, so the whole input is not kept in memory.
+        """
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures: collections.deque[concurrent.futures.Future[
+                Tuple[List[familytree.Node], Optional[familytree.Node]]]]
+            futures = collections.deque()
+            for records, separator in iter_records(stream, chunk_size):
+                if len(futures) >= 2 * jobs:
+                    self.__add_chunk(futures.popleft().result(), is_last=False)
+                futures.append(executor.submit(tokenize_records, records, separator))
+            while futures:
+                result = futures.popleft().result()
+                self.__add_chunk(result, is_last=not futures)
+        return self.graph
+
+    def __add_chunk(self, result: Tuple[List[familytree.Node], Optional[familytree.Node]], is_last: bool) -> None:
+        nodes, open_node = result
+        # The record which is open at the end of a chunk is closed by the next chunk.
+        if open_node and not is_last:
+            nodes.append(open_node)
+        for node in nodes:
+            node.intern_strings()
+            self.graph.append(node)
+
+    def tokenize_lines(self, lines: Iterable[bytes]) -> familytree.Graph:
+        """
+        Tokenizes gedcom lines into a graph. Lines are processed as bytes, only the values of the
+        tags we care about are decoded.
+        """
+        level1_handlers = self.__level1_handlers
+        for line in lines:
+            line = line.strip()
             if not line:
                 continue
-            tokens = line.split(" ")
 
-            first_token = tokens[0]
-            # Ignore UTF-8 BOM, if there is one at the beginning of the line.
-            if first_token.startswith("\ufeff"):
-                first_token = first_token[1:]
-
-            level = safe_atoi(first_token)
-            rest = " ".join(tokens[1:])
-            if level == 0:
-                self.__handle_level0(rest)
-            elif level == 1:
-                self.__handle_level1(rest)
+            if line[1:2] == b" " and 48 <= line[0] <= 57:
+                # Fast path for the usual single-digit level.
+                level = line[0] - 48
+                if level > 2:
+                    # Nothing to do with deeper levels, don't even slice them.
+                    continue
+                rest = line[2:]
+            else:
+                first_token, _, rest = line.partition(b" ")
+                # Ignore UTF-8 BOM, if there is one at the beginning of the line.
+                if first_token.startswith(b"\xef\xbb\xbf"):
+                    first_token = first_token[3:]
+                level = safe_atoi(first_token)
+
+            if level == 1:
+                self.in_birt = self.in_deat = self.in_marr = False
+                tag, _, value = rest.partition(b" ")
+                handler = level1_handlers.get(tag)
+                if handler:
+                    handler(value)
             elif level == 2:
-                if rest.startswith("DATE"):
-                    year = rest.rsplit(' ', maxsplit=1)[-1]
-                    if self.individual:
-                        if self.in_birt:
-                            self.individual.get_config().set_birth(year)
-                        elif self.in_deat:
-                            self.individual.get_config().set_death(year)
-                    elif self.family and self.in_marr:
-                        self.family.set_marr(year)
+                if rest.startswith(b"DATE"):
+                    self.__handle_date(rest)
+            elif level == 0:
+                self.__handle_level0(rest)
         return self.graph
 
 
-def bfs(root: Node, config: Dict[str, str]) -> List[Node]:
+def iter_records(stream: BinaryIO, chunk_size: int) -> Iterator[Tuple[bytes, bytes]]:
     """
-    Does a breadth first search traversal of the graph, from root. Returns the traversed nodes.
+    Reads a stream in fixed-size chunks and yields (records, separator) pairs, where records are
+    complete level 0 records, joined by the separator. The separator is decided the same way as in
+    iter_lines().
     """
-    visited = [root]
-    queue = [root]
-    ret: List[Node] = []
-
-    direction = config.get("direction", "both")
-    while queue:
-        node = queue.pop(0)
-        # Every 2nd node is a family + the root is always a family.
-        family_depth = int(config["familydepth"])
-        if node.get_depth() > family_depth * 2 + 1:
-            return ret
-        ret.append(node)
-        for neighbour in node.get_neighbours(direction):
-            if neighbour not in visited:
-                neighbour.set_depth(node.get_depth() + 1)
-                visited.append(neighbour)
-                queue.append(neighbour)
-
-    return ret
-
-
-def safe_atoi(string: str) -> int:
+    separator = b""
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buf = pending + chunk
+        if not separator:
+            if b"\n" not in buf:
+                pending = buf
+                continue
+            separator = b"\r\n" if b"\r" in buf else b"\n"
+        boundary = buf.rfind(separator + b"0 ")
+        if boundary < 0:
+            pending = buf
+            continue
+        yield buf[:boundary], separator
+        pending = buf[boundary + len(separator):]
+    if pending:
+        yield pending, separator or b"\n"
+
+
+def tokenize_records(records: bytes, separator: bytes) -> Tuple[List[familytree.Node], Optional[familytree.Node]]:
+    """
+    Tokenizes records from iter_records(), in a worker process. Returns the complete nodes and the
+    node of the last record, which may continue in the next chunk.
+    """
+    importer = GedcomImport()
+    graph = importer.tokenize_lines(records.split(separator))
+    open_node: Optional[familytree.Node] = importer.individual or importer.family
+    return graph.nodes, open_node
+
+
+def safe_atoi(string: Union[str, bytes]) -> int:
     """Converts str to an int, raising an own exception on error."""
     try:
         return int(string)
@@ -586,74 +434,107 @@ def safe_utf8_decode(source: bytes) -> str:
 
 class DotExport:
     """Serializes the graph to Graphviz / dot."""
+    # Number of nodes to collect before encoding and writing them in one go.
+    chunk_size = 4096
+
     def __init__(self) -> None:
-        self.subgraph: List[Node] = []
+        self.subgraph: List[familytree.Node] = []
         self.config: Dict[str, str] = {}
 
-    def __store_individual_nodes(self, stream: BinaryIO) -> None:
+    def __get_basepath(self) -> str:
+        """Gets the directory that image paths are relative to, or an empty string for absolute paths."""
+        if self.config.get("relpath", "false") == "true" and self.config["output"] != "-":
+            return os.path.dirname(os.path.abspath(self.config["output"]))
+        return ""
+
+    def __iter_individual_nodes(self) -> Iterator[str]:
+        image_dir = self.config.get("imagedir", "")
+        image_dir_abs = familytree.get_data_abspath(self.config.get("input", ""), image_dir)
+        cache_dir = self.config.get("cachedir", "")
+        if cache_dir:
+            cache_dir = familytree.get_data_abspath(self.config.get("input", ""), cache_dir)
+        thumbnails: Optional[imagecache.ThumbnailCache] = None
+        thumbnail_size = self.config.get("thumbnailsize", "")
+        if thumbnail_size:
+            if not cache_dir:
+                raise Ged2DotException("Thumbnails need a cachedir to be stored in.")
+            # Optional dependency, only needed when thumbnails are enabled.
+            if not importlib.util.find_spec("PIL"):
+                raise Ged2DotException("Creating thumbnails needs Pillow, see <https://pypi.org/project/pillow/>.")
+            thumbnails = imagecache.ThumbnailCache(cache_dir, safe_atoi(thumbnail_size))
+        sizes: Optional[imagecache.ImageSizeCache] = None
+        if self.config.get("imagesizes", "false") == "true":
+            sizes = imagecache.ImageSizeCache(cache_dir)
+        image_index = imagecache.ImageIndex(image_dir_abs, thumbnails, sizes)
+        image_index.scan(cache_dir)
+        name_order = self.config.get("nameorder", "little")
+        birth_format = self.config.get("birthformat", "{}-")
+        basepath = self.__get_basepath()
         for node in self.subgraph:
-            if not isinstance(node, Individual):
+            if not isinstance(node, familytree.Individual):
                 continue
-            individual = node
-            stream.write(to_bytes(node.get_identifier() + " [shape=box, "))
-            image_dir = self.config.get("imagedir", "")
-            image_dir_abs = get_data_abspath(self.config.get("input", ""), image_dir)
-            name_order = self.config.get("nameorder", "little")
-            birth_format = self.config.get("birthformat", "{}-")
-            basepath = ""
-            if self.config.get("relpath", "false") == "true" and self.config["output"] != "-":
-                basepath = os.path.dirname(os.path.abspath(self.config["output"]))
-            label = individual.get_label(image_dir_abs, name_order, birth_format, basepath)
-            stream.write(to_bytes("label = <" + label + ">\n"))
-            stream.write(to_bytes("color = " + individual.get_color() + "];\n"))
-
-    def __store_family_nodes(self, stream: BinaryIO) -> None:
-        stream.write(to_bytes("\n"))
+            label = node.get_label(image_dir_abs, name_order, birth_format, basepath, image_index)
+            yield node.get_identifier() + " [shape=box, label = <" + label + ">\ncolor = " + node.get_color() + "];\n"
+        if image_index.sizes:
+            image_index.sizes.save()
+
+    def __iter_family_nodes(self) -> Iterator[str]:
+        yield "\n"
+        image_path = familytree.get_abspath("marriage.svg")
+        basepath = self.__get_basepath()
+        if basepath:
+            image_path = os.path.relpath(image_path, basepath)
+
+        # Emit explicit size from marriage.svg, otherwise it won't be centered in the PNG
+        # output.
+        table_start = "<table border=\"0\" cellborder=\"0\" width=\"32px\" height=\"23px\">"
+
+        image_label = table_start + "<tr><td><img src=\"" + image_path + "\"/></td></tr></table>"
         for node in self.subgraph:
-            if not isinstance(node, Family):
+            if not isinstance(node, familytree.Family):
                 continue
-            image_path = get_abspath("marriage.svg")
-            if self.config.get("relpath", "false") == "true" and self.config["output"] != "-":
-                basepath = os.path.dirname(os.path.abspath(self.config["output"]))
-                image_path = os.path.relpath(image_path, basepath)
-
-            # Emit explicit size from marriage.svg, otherwise it won't be centered in the PNG
-            # output.
-            table_start = "<table border=\"0\" cellborder=\"0\" width=\"32px\" height=\"23px\">"
-
-            label = table_start + "<tr><td><img src=\"" + image_path + "\"/></td></tr></table>"
-            if node.get_marr():
-                label = node.get_marr()
+            label = node.get_marr() or image_label
             # Make sure family -> children edges appear left-to-right in the same order in which
             # they are defined in the input.
             attrs = "shape=circle, margin=\"0,0\", label=<" + label + ">, ordering=out"
-            stream.write(to_bytes(node.get_identifier() + " [" + attrs + "];\n"))
-        stream.write(to_bytes("\n"))
+            yield node.get_identifier() + " [" + attrs + "];\n"
+        yield "\n"
 
-    def __store_edges(self, stream: BinaryIO) -> None:
+    def __iter_edges(self) -> Iterator[str]:
         for node in self.subgraph:
-            if not isinstance(node, Family):
+            if not isinstance(node, familytree.Family):
                 continue
             family = node
+            identifier = family.get_identifier()
 
             # Open subgraph of the family.
-            cname = "cluster_" + family.get_identifier()
-            stream.write(to_bytes("subgraph " + cname + " { style=invis; \n"))
+            parts = ["subgraph cluster_" + identifier + " { style=invis; \n"]
 
             if family.wife:
-                from_wife = family.wife.get_identifier() + " -> " + family.get_identifier() + " [dir=none];\n"
-                stream.write(to_bytes(from_wife))
+                parts.append(family.wife.get_identifier() + " -> " + identifier + " [dir=none];\n")
             if family.husb:
-                from_husb = family.husb.get_identifier() + " -> " + family.get_identifier() + " [dir=none];\n"
-                stream.write(to_bytes(from_husb))
+                parts.append(family.husb.get_identifier() + " -> " + identifier + " [dir=none];\n")
 
             # Close subgraph of the family.
-            stream.write(to_bytes("}\n"))
+            parts.append("}\n")
 
             for child in family.child_list:
-                stream.write(to_bytes(family.get_identifier() + " -> " + child.get_identifier() + " [dir=none];\n"))
-
-    def store(self, subgraph: List[Node], config: Dict[str, str]) -> None:
+                parts.append(identifier + " -> " + child.get_identifier() + " [dir=none];\n")
+            yield "".join(parts)
+
+    def __iter_fragments(self) -> Iterator[str]:
+        """Yields the DOT output as strings, typically one per node."""
+        yield "// Generated by <https://github.com/vmiklos/ged2dot>.\n"
+        yield "digraph\n"
+        yield "{\n"
+        yield "splines = ortho;\n"
+        yield "\n"
+        yield from self.__iter_individual_nodes()
+        yield from self.__iter_family_nodes()
+        yield from self.__iter_edges()
+        yield "}\n"
+
+    def store(self, subgraph: List[familytree.Node], config: Dict[str, str]) -> None:
         """Exports subgraph to a graphviz path."""
         if config["output"] == "-":
             self.store_to_stream(subgraph, sys.stdout.buffer, config)
@@ -661,32 +542,37 @@ class DotExport:
         with open(config["output"], "wb") as stream:
             self.store_to_stream(subgraph, stream, config)
 
-    def store_to_stream(self, subgraph: List[Node], stream: BinaryIO, config: Dict[str, str]) -> None:
+    def store_to_stream(self, subgraph: List[familytree.Node], stream: BinaryIO, config: Dict[str, str]) -> None:
         """Exports subgraph to a graphviz stream."""
-        stream.write(to_bytes("// Generated by <https://github.com/vmiklos/ged2dot>.\n"))
-        stream.write(to_bytes("digraph\n"))
-        stream.write(to_bytes("{\n"))
-        stream.write(to_bytes("splines = ortho;\n"))
-        stream.write(to_bytes("\n"))
-
+        for chunk in self.iter_dot(subgraph, config):
+            stream.write(chunk)
+
+    def iter_dot(self, subgraph: List[familytree.Node], config: Dict[str, str]) -> Iterator[bytes]:
+        """
+        Exports subgraph to graphviz, yielding the encoded output in chunks as the subgraph is
+        walked. This allows feeding a dot process while the export is still in progress.
+        """
         self.subgraph = subgraph
         self.config = config
-        self.__store_individual_nodes(stream)
-        self.__store_family_nodes(stream)
-        self.__store_edges(stream)
-
-        stream.write(to_bytes("}\n"))
-
-
-def convert(config: Dict[str, str]) -> None:
-    """API interface."""
+        # Encode the output in large chunks, not fragment by fragment.
+        chunk: List[str] = []
+        for fragment in self.__iter_fragments():
+            chunk.append(fragment)
+            if len(chunk) >= DotExport.chunk_size:
+                yield to_bytes("".join(chunk))
+                chunk.clear()
+        yield to_bytes("".join(chunk))
+
+
+def get_subgraph(config: Dict[str, str]) -> List[familytree.Node]:
+    """Loads the input and finds the subgraph around the root family."""
     importer = GedcomImport()
-    graph = importer.load(config)
-    root_family = graph_find(graph, config["rootfamily"])
+    graph = importer.load(config, lazy=True)
+    root_family = graph.find(config["rootfamily"])
     if not root_family:
         family_id = ""
         for node in graph:
-            if not isinstance(node, Family):
+            if not isinstance(node, familytree.Family):
                 continue
             family_id = node.get_identifier()
             break
@@ -694,9 +580,318 @@ def convert(config: Dict[str, str]) -> None:
         if family_id:
             reason += f" First valid family would be '{family_id}'."
         raise Ged2DotException(reason)
-    subgraph = bfs(root_family, config)
-    exporter = DotExport()
-    exporter.store(subgraph, config)
+    return familytree.bfs(root_family, config)
+
+
+def find_dot() -> str:
+    """Finds the dot executable of Graphviz."""
+    if not sys.platform.startswith("win"):
+        return "dot"
+
+    pattern = ""
+    for program_files in ["PROGRAMFILES", "PROGRAMFILES(x86)"]:
+        if program_files not in os.environ:
+            continue
+        pattern = os.path.join(os.environ[program_files], "Graphviz*", "bin", "dot.exe")
+        dot_paths = glob.glob(pattern)
+        if dot_paths:
+            return dot_paths[-1]
+    url = "<https://graphviz.gitlab.io/_pages/Download/Download_windows.html>"
+    raise Ged2DotException(f"No dot.exe found at '{pattern}', please download it from {url}.")
+
+
+def run_dot(chunks: Iterable[bytes], image_format: str) -> bytes:
+    """Lays out DOT, provided in chunks, using a dot process. Returns the output of dot."""
+    args = [find_dot(), "-T" + image_format]
+    try:
+        with subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE) as process:
+            assert process.stdin
+            # dot reads all of its input before writing the output, so this can't deadlock.
+            for chunk in chunks:
+                process.stdin.write(chunk)
+            output = process.communicate()[0]
+    except FileNotFoundError as exc:
+        raise Ged2DotException(f"Failed to run '{args[0]}', is Graphviz installed?") from exc
+    if process.returncode:
+        raise Ged2DotException(f"'{args[0]}' failed with exit code {process.returncode}.")
+    return output
+
+
+@functools.cache
+def get_dot_version(dot_path: str) -> str:
+    """Gets the version of dot, as its output may change between versions."""
+    try:
+        process = subprocess.run([dot_path, "-V"], capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise Ged2DotException(f"Failed to run '{dot_path}', is Graphviz installed?") from exc
+    return safe_utf8_decode(process.stderr).strip()
+
+
+def render_subgraph(subgraph: List[familytree.Node], config: Dict[str, str],
+                    layout: Callable[[Iterable[bytes], str], bytes] = run_dot, layout_version: str = "") -> bytes:
+    """Converts subgraph to the 'format' of config, see render()."""
+    return render_dot(DotExport().iter_dot(subgraph, config), config, layout, layout_version)
+
+
+def render_dot(chunks: Iterable[bytes], config: Dict[str, str],
+               layout: Callable[[Iterable[bytes], str], bytes] = run_dot, layout_version: str = "") -> bytes:
+    """Converts DOT chunks to the 'format' of config, see render()."""
+    image_format = config.get("format", "svg")
+    if image_format == "dot":
+        return b"".join(chunks)
+    if config.get("cachedir", ""):
+        if layout is run_dot and not layout_version:
+            layout_version = get_dot_version(find_dot())
+        # Without a version, outputs of a custom layout can't be cached safely.
+        if layout_version:
+            cache_dir = familytree.get_data_abspath(config.get("input", ""), config["cachedir"])
+            max_size = safe_atoi(config.get("rendercachesize", "100")) * 1024 * 1024
+            layout = rendercache.RenderCache(cache_dir, max_size, layout_version, layout).layout
+    output = layout(chunks, image_format)
+    if image_format == "svg" and config.get("inline", "false") == "true":
+        inline = io.BytesIO()
+        inlineize.inlineize(io.BytesIO(output), inline)
+        output = inline.getvalue()
+    return output
+
+
+def render(config: Dict[str, str], layout: Callable[[Iterable[bytes], str], bytes] = run_dot,
+           layout_version: str = "") -> bytes:
+    """
+    API interface for rendered output: converts GEDCOM to DOT, then lays it out with dot in the
+    'format' of config, then inlines the images if 'inline' is 'true' and the format is SVG. The data
+    flows through pipes and memory buffers, without temporary files. layout may be replaced, e.g.
+    to use the Graphviz library in-process. If 'cachedir' is set, the output of the layout is cached
+    there, layout_version is the Graphviz version of a custom layout.
+    """
+    return render_subgraph(get_subgraph(config), config, layout, layout_version)
+
+
+def store_subgraph(subgraph: List[familytree.Node], config: Dict[str, str]) -> None:
+    """Writes subgraph to the 'output' of config, in its 'format'."""
+    if config.get("format", "dot") == "dot":
+        DotExport().store(subgraph, config)
+        return
+    output = render_subgraph(subgraph, config)
+    if config["output"] == "-":
+        sys.stdout.buffer.write(output)
+        return
+    with open(config["output"], "wb") as stream:
+        stream.write(output)
+
+
+def convert(config: Dict[str, str]) -> None:
+    """API interface."""
+    subgraph = get_subgraph(config)
+    store_subgraph(subgraph, config)
+
+
+def export_family(graph: familytree.Graph, root_family: str, config: Dict[str, str]) -> str:
+    """
+    Exports the subgraph around root_family, replacing '{rootfamily}' in the output of config.
+    Returns the output path.
+    """
+    family_config = dict(config)
+    family_config["rootfamily"] = root_family
+    family_config["output"] = config["output"].replace("{rootfamily}", root_family)
+    root = graph.find(root_family)
+    assert root
+    subgraph = familytree.bfs(root, family_config)
+    store_subgraph(subgraph, family_config)
+    return family_config["output"]
+
+
+# The graph of a batch export worker process, see init_batch_worker().
+BATCH_GRAPH: Optional[familytree.CsrGraph] = None
+
+
+def init_batch_worker(columns: Any) -> None:
+    """Sets up a batch export worker process, columns is from CsrGraph.to_tuple()."""
+    global BATCH_GRAPH  # pylint: disable=global-statement
+    BATCH_GRAPH = familytree.CsrGraph.from_tuple(columns)
+
+
+def export_family_in_worker(root_family: str, config: Dict[str, str]) -> str:
+    """Exports the subgraph around root_family in a batch export worker process."""
+    assert BATCH_GRAPH
+    return export_family(BATCH_GRAPH, root_family, config)
+
+
+def batch_convert(config: Dict[str, str]) -> List[str]:
+    """
+    API interface, exporting multiple families: the 'rootfamilies' of config is a comma-separated
+    list of root families or 'all'. The input is parsed once, then the subgraphs are exported in
+    parallel if 'jobs' allows it. Returns the output paths.
+    """
+    if "{rootfamily}" not in config["output"]:
+        raise Ged2DotException("The output path must contain '{rootfamily}' when exporting multiple families.")
+    importer = GedcomImport()
+    # The compact graph is cheap to send to worker processes, and only the visited nodes are
+    # materialised in them.
+    graph = familytree.to_csr_graph(importer.load(config, lazy=True))
+    if config["rootfamilies"] == "all":
+        root_families = graph.get_family_ids()
+    else:
+        root_families = [i.strip() for i in config["rootfamilies"].split(",") if i.strip()]
+    for root_family in root_families:
+        if not isinstance(graph.find(root_family), familytree.Family):
+            raise Ged2DotException(f"Root family '{root_family}' is not found.")
+
+    jobs = safe_atoi(config.get("jobs", "1"))
+    if jobs <= 1 or len(root_families) <= 1:
+        return [export_family(graph, root_family, config) for root_family in root_families]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker,
+                                                initargs=(graph.to_tuple(),)) as executor:
+        # Send families in batches, but still spread them evenly between the workers.
+        chunksize = max(1, len(root_families) // (jobs * 4))
+        configs = [config] * len(root_families)
+        return list(executor.map(export_family_in_worker, root_families, configs, chunksize=chunksize))
+
+
+class ServedInput:
+    """
+    An input of the server or of a GUI: parsed once, parsed again when the file changes. A GUI lists
+    the families, then converts from the same graph.
+    """
+    def __init__(self, config: Dict[str, str]) -> None:
+        self.config = config
+        # Traversal sets the depth of nodes and visiting nodes resolves them, so one request at a
+        # time may use the graph.
+        self.lock = threading.Lock()
+        self.key: Optional[Tuple[int, int]] = None
+        self.graph = familytree.Graph()
+
+    def __load_if_changed(self) -> None:
+        stat = os.stat(self.config["input"])
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self.key:
+            self.graph = GedcomImport().load(self.config, lazy=True)
+            self.key = key
+
+    def load(self) -> None:
+        """Parses the input if it changed since the last parse."""
+        with self.lock:
+            self.__load_if_changed()
+
+    def get_families(self) -> List[familytree.Family]:
+        """Gets the families of the input, with their wife and husband resolved."""
+        with self.lock:
+            self.__load_if_changed()
+            families = [node for node in self.graph if isinstance(node, familytree.Family)]
+            for family in families:
+                family.resolve_lazily()
+            return families
+
+    def __get_subgraph(self, root_family: str, config: Dict[str, str]) -> Optional[List[familytree.Node]]:
+        self.__load_if_changed()
+        root = self.graph.find(root_family)
+        if not isinstance(root, familytree.Family):
+            return None
+        return familytree.bfs(root, config)
+
+    def get_dot(self, root_family: str, config: Dict[str, str]) -> Optional[bytes]:
+        """Gets the DOT around root_family, or None if there is no such family."""
+        with self.lock:
+            subgraph = self.__get_subgraph(root_family, config)
+            if subgraph is None:
+                return None
+            return b"".join(DotExport().iter_dot(subgraph, config))
+
+    def iter_dot(self, root_family: str, config: Dict[str, str]) -> Generator[bytes, None, None]:
+        """
+        Yields the DOT around root_family in chunks, so a GUI can cancel between chunks. The graph
+        is locked till the iterator is exhausted or closed.
+        """
+        with self.lock:
+            subgraph = self.__get_subgraph(root_family, config)
+            if subgraph is None:
+                raise Ged2DotException(f"Root family '{root_family}' is not found.")
+            yield from DotExport().iter_dot(subgraph, config)
+
+
+class Ged2DotServer(http.server.ThreadingHTTPServer):
+    """Serves the subgraphs of parsed inputs, see serve()."""
+    def __init__(self, address: Tuple[str, int], inputs: Dict[str, ServedInput], config: Dict[str, str]) -> None:
+        super().__init__(address, Ged2DotRequestHandler)
+        self.inputs = inputs
+        self.config = config
+
+
+class Ged2DotRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handles a /dot, /svg or /png request of Ged2DotServer."""
+    server: Ged2DotServer
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Handles a GET request."""
+        url = urllib.parse.urlsplit(self.path)
+        content_types = {"/dot": "text/vnd.graphviz", "/svg": "image/svg+xml", "/png": "image/png"}
+        if url.path not in content_types:
+            self.send_error(404, "Unknown path, use /dot, /svg or /png.")
+            return
+        params = dict(urllib.parse.parse_qsl(url.query))
+        inputs = self.server.inputs
+        name = params.get("input", "")
+        if name and name not in inputs:
+            self.send_error(404, f"Input '{name}' is not served.")
+            return
+        served = inputs[name] if name else next(iter(inputs.values()))
+        config = dict(served.config)
+        config["format"] = url.path[1:]
+        config["familydepth"] = params.get("depth", config["familydepth"])
+        config["direction"] = params.get("direction", config["direction"])
+        if not config["familydepth"].isdigit() or config["direction"] not in ("both", "child"):
+            self.send_error(400, "Invalid depth or direction.")
+            return
+        root_family = params.get("root", config["rootfamily"])
+        try:
+            dot = served.get_dot(root_family, config)
+            if dot is None:
+                self.send_error(404, f"Root family '{root_family}' is not found.")
+                return
+            # Layout is outside the lock of the input, so requests can run dot in parallel.
+            output = render_dot([dot], config)
+        except (Ged2DotException, OSError) as exc:
+            self.send_error(500, str(exc))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_types[url.path])
+        self.send_header("Content-Length", str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
+
+
+def create_server(config: Dict[str, str]) -> Ged2DotServer:
+    """Creates a server for serve(), parsing its inputs."""
+    inputs: Dict[str, ServedInput] = {}
+    for path in config["input"].split(","):
+        input_config = dict(config)
+        input_config["input"] = path.strip()
+        # Requests select an input by its file name.
+        name = os.path.basename(input_config["input"])
+        if name in inputs:
+            raise Ged2DotException(f"Input file name '{name}' is not unique.")
+        inputs[name] = ServedInput(input_config)
+    # Only parse once all names are known to be unique.
+    for served in inputs.values():
+        served.load()
+    return Ged2DotServer(("127.0.0.1", int(config["serve"])), inputs, config)
+
+
+def serve(config: Dict[str, str]) -> None:
+    """
+    API interface for a long-running server: parses the 'input' of config (can be comma-separated)
+    once, then serves e.g. /dot?root=F12&depth=3&direction=child at the localhost port 'serve'. /svg
+    and /png run dot, and input=<file name> selects an input. An input is parsed again when it
+    changes.
+    """
+    server = create_server(config)
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]}/dot", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 def main() -> None:
@@ -709,7 +904,7 @@ def main() -> None:
     parser.add_argument("--input", type=str,
                         help="input GEDCOM file")
     parser.add_argument("--output", type=str,
-                        help="output DOT file")
+                        help="output file")
     parser.add_argument("--rootfamily", type=str,
                         help="root family")
     parser.add_argument("--familydepth", type=str,
@@ -724,11 +919,39 @@ def main() -> None:
                         help="birth format when death is missing (default: '{}-', e.g. '1942-')")
     parser.add_argument("--relpath", dest="relpath", action="store_true",
                         help="try to use relative paths (default: false)")
+    parser.add_argument("--backend", choices=["objects", "csr"],
+                        help="graph storage, 'csr' is more compact for large input (default: objects)")
+    parser.add_argument("--cachedir", type=str,
+                        help="directory to cache the parsed input in (default: no cache)")
+    parser.add_argument("--jobs", type=str,
+                        help="number of processes to parse the input and to export multiple families with (default: 1)")
+    parser.add_argument("--format", choices=["dot", "svg", "png"],
+                        help="output format, other than 'dot' needs Graphviz installed (default: dot)")
+    parser.add_argument("--inline", dest="inline", action="store_true",
+                        help="embed images into SVG output (default: false)")
+    parser.add_argument("--rendercachesize", type=str,
+                        help="size limit of rendered outputs in cachedir, in MiB (default: 100)")
+    parser.add_argument("--rootfamilies", type=str,
+                        help="comma-separated root families or 'all' to export in one go, "
+                        + "the output then must contain '{rootfamily}' (default: only rootfamily)")
+    parser.add_argument("--thumbnailsize", type=str,
+                        help="downscale photos to fit this size in pixels, needs cachedir and Pillow (default: no)")
+    parser.add_argument("--imagesizes", dest="imagesizes", action="store_true",
+                        help="state the size of images in labels, so the layout doesn't depend on dot "
+                        + "finding them (default: false)")
+    parser.add_argument("--serve", type=str,
+                        help="port to serve DOT / SVG / PNG on at localhost, the input can be comma-separated "
+                        + "(default: no server)")
     args = parser.parse_args()
     config = Config()
     config.read_config(args.config)
     config.read_args(args)
-    convert(config.get_dict())
+    if config.serve:
+        serve(config.get_dict())
+    elif config.rootfamilies:
+        batch_convert(config.get_dict())
+    else:
+        convert(config.get_dict())
 
 
 if __name__ == '__main__':
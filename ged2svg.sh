@@ -6,15 +6,10 @@
 #
 
 #
-# This script runs ged2dot, dot and inlineize to create an inline SVG.
+# This script runs ged2dot to create an inline SVG, which runs dot and inlines the images in memory.
 #
 
 GED2DOT=$(dirname $(realpath $0))/ged2dot.py
-$GED2DOT --config ged2dotrc
-
-dot -Tsvg -o test.svg test.dot
-
-INLINEIZE=$(dirname $(realpath $0))/inlineize.py
-$INLINEIZE test.svg test-inline.svg
+$GED2DOT --config ged2dotrc --format svg --inline --output test-inline.svg
 
 # vim:set shiftwidth=4 softtabstop=4 expandtab:
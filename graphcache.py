@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+
+"""Caches parsed GEDCOM graphs on disk."""
+
+from typing import Dict
+from typing import Optional
+import hashlib
+import marshal
+import os
+import sys
+import threading
+
+import familytree
+
+
+class GraphCache:
+    """
+    Stores resolved graphs on disk, in a file next to the input or in a cache directory, keyed by
+    the input path, size and modification time.
+    """
+    # Bump this when the output of CsrGraph.to_tuple() changes.
+    version = 1
+
+    def __init__(self, config: Dict[str, str]) -> None:
+        ged_path = os.path.realpath(config["input"])
+        cache_dir = familytree.get_data_abspath(ged_path, config["cachedir"])
+        digest = hashlib.sha256(ged_path.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, f"ged2dot-{digest}.cache")
+        stat = os.stat(ged_path)
+        self.key = (GraphCache.version, marshal.version, sys.byteorder, ged_path, stat.st_size, stat.st_mtime_ns)
+
+    def load(self) -> Optional[familytree.CsrGraph]:
+        """Loads the graph from the cache, if it's up to date."""
+        try:
+            with open(self.path, "rb") as stream:
+                # marshal.load() would read the stream in small pieces, this is much faster.
+                key, columns = marshal.loads(stream.read())
+            if key != self.key:
+                return None
+            return familytree.CsrGraph.from_tuple(columns)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def store(self, graph: familytree.Graph) -> None:
+        """Stores a resolved graph in the cache, if the cache can be written."""
+        graph = familytree.to_csr_graph(graph)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Write to a temporary file and rename, so a parallel load never sees a partial file.
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}"
+            with open(temp_path, "wb") as stream:
+                stream.write(marshal.dumps((self.key, graph.to_tuple())))
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The cache is just an optimization.
+            pass
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab:
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+
+"""Finds the images of individuals, with their thumbnails and sizes cached on disk."""
+
+from typing import BinaryIO
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import cast
+import hashlib
+import io
+import marshal
+import os
+import re
+import struct
+import threading
+import unicodedata
+
+
+class ThumbnailCache:
+    """
+    Downscaled copies of images in a cache directory, so dot doesn't have to decode multi-megabyte
+    photos and inlining doesn't embed them at full size. Thumbnails are keyed by the path, mtime and
+    size of the original, so a changed photo gets a new thumbnail. Needs Pillow.
+    """
+    def __init__(self, cache_dir: str, size: int) -> None:
+        self.cache_dir = cache_dir
+        self.size = size
+
+    def get_path(self, path: str) -> str:
+        """Gets the path of the thumbnail of the image at path, or path if there can't be one."""
+        try:
+            stat = os.stat(path)
+            key = f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{self.size}"
+            digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+            extension = os.path.splitext(path)[1].lower()
+            thumbnail_path = os.path.join(self.cache_dir, f"ged2dot-thumbnail-{digest}{extension}")
+            if not os.path.exists(thumbnail_path):
+                self.__create(path, thumbnail_path)
+            return thumbnail_path
+        except OSError:
+            # Not an image Pillow can read, or the thumbnail can't be written.
+            return path
+
+    def __create(self, path: str, thumbnail_path: str) -> None:
+        from PIL import Image, ImageOps  # pylint: disable=import-outside-toplevel
+        with Image.open(path) as image:
+            # Let JPEG decoding already downscale, that's much faster than decoding at full size.
+            image.draft(image.mode, (self.size, self.size))
+            # Photos from cameras are often stored rotated, with the orientation in EXIF.
+            thumbnail = ImageOps.exif_transpose(image)
+            thumbnail.thumbnail((self.size, self.size))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{thumbnail_path}.{os.getpid()}.{threading.get_ident()}"
+            thumbnail.save(temp_path, format=image.format)
+        os.replace(temp_path, thumbnail_path)
+
+
+# Multipliers from SVG length units to points, like dot's: a plain number is taken as points.
+SVG_UNITS = {"": 1.0, "pt": 1.0, "px": 72 / 96, "pc": 12.0, "in": 72.0, "cm": 72 / 2.54, "mm": 72 / 25.4}
+
+
+def get_jpeg_size(stream: BinaryIO) -> Optional[Tuple[int, int]]:
+    """Gets the size of a JPEG image from its start of frame, skipping over the other segments."""
+    stream.seek(2)
+    while True:
+        marker = stream.read(2)
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None
+        if marker[1] == 0xff:
+            # Fill byte.
+            stream.seek(-1, io.SEEK_CUR)
+            continue
+        if 0xd0 <= marker[1] <= 0xd9 or marker[1] == 0x01:
+            # No length, no payload.
+            continue
+        length = stream.read(2)
+        if len(length) < 2:
+            return None
+        if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8, 0xcc):
+            frame = stream.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:])
+            return width, height
+        stream.seek(struct.unpack(">H", length)[0] - 2, io.SEEK_CUR)
+
+
+def get_svg_size(header: bytes) -> Optional[Tuple[int, int]]:
+    """Gets the size of an SVG image in points from the width and height of its root element."""
+    match = re.search(rb"<svg\b([^>]*)>", header)
+    if not match:
+        return None
+    size: List[int] = []
+    for name in (b"width", b"height"):
+        attribute = re.search(rb"\s" + name + rb"\s*=\s*[\"']\s*([0-9.]+)\s*([a-z]*)\s*[\"']", match.group(1))
+        if not attribute or attribute.group(2).decode("ascii") not in SVG_UNITS:
+            # No size or e.g. a percentage: leave it to dot.
+            return None
+        try:
+            points = float(attribute.group(1)) * SVG_UNITS[attribute.group(2).decode("ascii")]
+        except ValueError:
+            return None
+        # dot then scales the points like pixels of a raster image, see below.
+        size.append(int(points * 72 / 96))
+    return size[0], size[1]
+
+
+def get_image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Gets the size of the image at path in points, as dot would size it, only reading the header of
+    the file. Returns None if the format is not known.
+    """
+    with open(path, "rb") as stream:
+        header = stream.read(4096)
+        if header.startswith(b"\x89PNG\r\n\x1a\n") and len(header) >= 24:
+            width, height = struct.unpack(">II", header[16:24])
+        elif header.startswith(b"GIF8") and len(header) >= 10:
+            width, height = struct.unpack("<HH", header[6:10])
+        elif header.startswith(b"\xff\xd8"):
+            jpeg_size = get_jpeg_size(stream)
+            if not jpeg_size:
+                return None
+            width, height = jpeg_size
+        else:
+            return get_svg_size(header)
+    # dot assumes 96 DPI for raster images and truncates.
+    return int(width * 72 / 96), int(height * 72 / 96)
+
+
+class ImageSizeCache:
+    """
+    Sizes of images, so labels can state them and the layout doesn't depend on dot finding the images.
+    Sizes are keyed by the path, mtime and size of the file, and can be stored in a cache directory,
+    then an image is only opened again when it changes.
+    """
+    # Bump this when the stored dict changes.
+    version = 1
+
+    def __init__(self, cache_dir: str = "") -> None:
+        self.cache_path = ""
+        # Path -> (mtime, file size, width, height), the width is 0 if the size is not known.
+        self.sizes: Dict[str, Tuple[int, int, int, int]] = {}
+        # Path -> size, for the paths already checked during this export, so e.g. the placeholder
+        # image is only stat'ed once.
+        self.checked: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.modified = False
+        if cache_dir:
+            self.cache_path = os.path.join(cache_dir, "ged2dot-image-sizes.cache")
+            self.__load()
+
+    def __load(self) -> None:
+        try:
+            with open(self.cache_path, "rb") as stream:
+                version, sizes = marshal.loads(stream.read())
+            if version == ImageSizeCache.version:
+                self.sizes = sizes
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    def get_size(self, path: str) -> Optional[Tuple[int, int]]:
+        """Gets the size of the image at path in points, or None if it's not known."""
+        if path in self.checked:
+            return self.checked[path]
+        self.checked[path] = self.__get_size(path)
+        return self.checked[path]
+
+    def __get_size(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+            cached = self.sizes.get(path)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                width, height = cached[2:]
+            else:
+                width, height = get_image_size(path) or (0, 0)
+                self.sizes[path] = (stat.st_mtime_ns, stat.st_size, width, height)
+                self.modified = True
+        except OSError:
+            return None
+        if not width:
+            return None
+        return width, height
+
+    def save(self) -> None:
+        """Stores the sizes in the cache directory, if there are new ones."""
+        if not self.cache_path or not self.modified:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}"
+            with open(temp_path, "wb") as stream:
+                stream.write(marshal.dumps((ImageSizeCache.version, self.sizes)))
+            os.replace(temp_path, self.cache_path)
+            self.modified = False
+        except OSError:
+            # The cache is an optimization, the output is the same without it.
+            pass
+
+
+class ImageIndex:
+    """
+    Knows which files are in an image directory. Listing the directory once is much cheaper than
+    probing several candidate paths for each individual, especially on a network file system. The
+    listing can be stored in a cache directory, then it's reused till the directory changes. The
+    optional thumbnails and sizes are applied to the found images during an export.
+    """
+    # Bump this when the stored tuple changes.
+    version = 2
+
+    def __init__(self, image_dir: str, thumbnails: Optional[ThumbnailCache] = None,
+                 sizes: Optional[ImageSizeCache] = None) -> None:
+        self.image_dir = image_dir
+        # Normalized name -> actual name. None means the directory is not listed, so names are
+        # checked on the file system.
+        self.names: Optional[Dict[str, str]] = None
+        self.thumbnails = thumbnails
+        # None means labels don't state the size of images.
+        self.sizes = sizes
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Normalizes a file name, so macOS (NFD) and Windows (case-insensitive) names match."""
+        if not name.isascii():
+            name = unicodedata.normalize("NFC", name)
+        return os.path.normcase(name)
+
+    def scan(self, cache_dir: str = "") -> None:
+        """Lists the image directory, or loads the listing from cache_dir if it's up to date."""
+        try:
+            mtime = os.stat(self.image_dir).st_mtime_ns
+            cache_path = ""
+            if cache_dir:
+                digest = hashlib.sha256(self.image_dir.encode("utf-8")).hexdigest()[:16]
+                cache_path = os.path.join(cache_dir, f"ged2dot-images-{digest}.cache")
+                key = (ImageIndex.version, self.image_dir, mtime)
+                names = self.__load(cache_path, key)
+                if names is not None:
+                    self.names = names
+                    return
+            self.names = {ImageIndex.normalize(name): name for name in os.listdir(self.image_dir)}
+            if cache_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}"
+                with open(temp_path, "wb") as stream:
+                    stream.write(marshal.dumps((key, self.names)))
+                os.replace(temp_path, cache_path)
+        except (FileNotFoundError, NotADirectoryError):
+            # No image directory: no images.
+            self.names = {}
+        except OSError:
+            # Can't list or cache it, fall back to probing.
+            pass
+
+    @staticmethod
+    def __load(cache_path: str, key: Tuple[int, str, int]) -> Optional[Dict[str, str]]:
+        try:
+            with open(cache_path, "rb") as stream:
+                cached_key, names = marshal.loads(stream.read())
+            if cached_key != key:
+                return None
+            return cast(Dict[str, str], names)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def contains(self, name: str) -> bool:
+        """Decides if the image directory has a file with the given name."""
+        if self.names is None:
+            return os.path.exists(os.path.join(self.image_dir, name).encode("utf-8"))
+        return ImageIndex.normalize(name) in self.names
+
+    def get_path(self, name: str) -> str:
+        """
+        Gets the path of the image with the given name, or of its thumbnail. The path has the
+        actual name of the file, which may differ from name, see normalize().
+        """
+        if self.names is not None:
+            name = self.names.get(ImageIndex.normalize(name), name)
+        path = os.path.join(self.image_dir, name)
+        if self.thumbnails:
+            return self.thumbnails.get_path(path)
+        return path
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab:
@@ -13,16 +13,31 @@ import traceback
 from typing import Any
 from typing import Dict
 from typing import Iterable
+from typing import Optional
 from typing import Tuple
 import uno  # type: ignore  # pylint: disable=import-error
 from com.sun.star.beans import PropertyValue  # type: ignore  # pylint: disable=import-error
 
+import ged2dot
+
 
 class GedcomBase:
     """Shared code between GedcomDialog and GedcomImport."""
+    # The last input, so the import after the dialog doesn't parse it again.
+    served_input: Optional[ged2dot.ServedInput] = None
+
     def __init__(self, context: Any) -> None:
         self.context = context
 
+    @staticmethod
+    def get_input(ged: str, cache_dir: str = "") -> ged2dot.ServedInput:
+        """Gets the input at ged, which keeps its graph till the file or the cache directory changes."""
+        served_input = GedcomBase.served_input
+        if not served_input or served_input.config["input"] != ged or served_input.config["cachedir"] != cache_dir:
+            served_input = ged2dot.ServedInput({"input": ged, "cachedir": cache_dir})
+            GedcomBase.served_input = served_input
+        return served_input
+
     def create_uno_service(self, name: str) -> Any:
         """Creates an UNO object instalce with the given name."""
         return self.context.ServiceManager.createInstanceWithContext(f"com.sun.star.{name}", self.context)
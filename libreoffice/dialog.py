@@ -23,7 +23,7 @@ from com.sun.star.awt.PushButtonType import OK as PushButtonType_OK  # type: ign
 from com.sun.star.awt.PushButtonType import CANCEL as PushButtonType_CANCEL  # pylint: disable=import-error
 
 import base
-import ged2dot
+import familytree
 
 
 class GedcomDialog(unohelper.Base, XPropertyAccess, XExecutableDialog, XImporter, base.GedcomBase):  # type: ignore
@@ -31,7 +31,7 @@ class GedcomDialog(unohelper.Base, XPropertyAccess, XExecutableDialog, XImporter
     def __init__(self, context: Any, _dialogArgs: Any) -> None:
         unohelper.Base.__init__(self)
         base.GedcomBase.__init__(self, context)
-        self.family_dict: Dict[str, ged2dot.Family] = {}
+        self.family_dict: Dict[str, familytree.Family] = {}
         self.root_family: Optional[str] = None
         self.layout_max = "4"
         self.name_order = "little"
@@ -39,15 +39,8 @@ class GedcomDialog(unohelper.Base, XPropertyAccess, XExecutableDialog, XImporter
 
     def __extract_families(self) -> None:
         ged = unohelper.fileUrlToSystemPath(self.props['URL'])
-        config = {
-            'input': ged,
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
         self.family_dict = {}
-        for node in graph:
-            if not isinstance(node, ged2dot.Family):
-                continue
+        for node in self.get_input(ged).get_families():
             help_string = ""
             if node.husb and node.husb.get_surname():
                 help_string += node.husb.get_surname()
@@ -7,15 +7,11 @@
 
 """Provides the GedcomImport class."""
 
-import glob
-import io
-import os
-import subprocess
-import sys
 from typing import Any
 from typing import Dict
 from typing import Iterable
 from typing import Tuple
+import contextlib
 
 import uno  # type: ignore  # pylint: disable=import-error
 import unohelper  # type: ignore  # pylint: disable=import-error
@@ -26,7 +22,6 @@ from com.sun.star.beans import PropertyValue  # type: ignore  # pylint: disable=
 
 import base
 import ged2dot
-import inlineize
 
 
 class GedcomImport(unohelper.Base, XFilter, XImporter, XExtendedFilterDetection, base.GedcomBase):  # type: ignore
@@ -39,71 +34,31 @@ class GedcomImport(unohelper.Base, XFilter, XImporter, XExtendedFilterDetection,
         self.props: Dict[str, Any] = {}
         self.dst_doc = None
 
-    @staticmethod
-    def __find_dot() -> str:
-        if sys.platform.startswith("win"):
-            pattern = os.environ['PROGRAMFILES'] + '\\Graphviz*\\bin\\dot.exe'
-            dot_paths = glob.glob(pattern)
-            if not dot_paths and 'PROGRAMFILES(x86)' in os.environ:
-                pattern = os.environ['PROGRAMFILES(x86)'] + '\\Graphviz*\\bin\\dot.exe'
-                dot_paths = glob.glob(pattern)
-            if not dot_paths:
-                url = "<https://graphviz.gitlab.io/_pages/Download/Download_windows.html>"
-                raise IOError(f"No dot.exe found at '{pattern}', please download it from {url}.")
-            dot_path = dot_paths[-1]
-        else:
-            dot_path = "dot"
-        return dot_path
-
-    @staticmethod
-    def __to_dot(config: Dict[str, str]) -> io.BytesIO:
-        dot = io.BytesIO()
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        root_node = ged2dot.graph_find(graph, config["rootfamily"])
-        assert root_node
-        subgraph = ged2dot.bfs(root_node, config)
-        exporter = ged2dot.DotExport()
-        exporter.store_to_stream(subgraph, dot, config)
-        return dot
-
     def __to_svg(self, ged: str) -> bytes:
         root_family = "F1"
         layout_max_depth = "4"
         name_order = "little"
+        cache_dir = ""
         if "FilterData" in self.props:
             filter_data = self.to_dict(self.props["FilterData"])
             root_family = filter_data.get("rootfamily", root_family)
             layout_max_depth = filter_data.get("familydepth", layout_max_depth)
             name_order = filter_data.get("nameorder", name_order)
+            cache_dir = filter_data.get("cachedir", cache_dir)
         config = {
             'input': ged,
             'rootfamily': root_family,
             'familydepth': layout_max_depth,
             'nameorder': name_order,
             "imagedir": "images",
+            "format": "svg",
+            "inline": "true",
+            "cachedir": cache_dir,
         }
-
-        dot = self.__to_dot(config)
-
-        dot_path = self.__find_dot()
-        with subprocess.Popen([dot_path, '-Tsvg'], stdin=subprocess.PIPE, stdout=subprocess.PIPE) as graphviz:
-            dot.seek(0)
-            assert graphviz.stdin
-            graphviz.stdin.write(dot.read())
-            graphviz.stdin.close()
-            noinline = io.BytesIO()
-            assert graphviz.stdout
-            noinline.write(graphviz.stdout.read())
-            graphviz.stdout.close()
-            graphviz.wait()
-
-        noinline.seek(0)
-        inline = io.BytesIO()
-        inlineize.inlineize(noinline, inline)
-
-        inline.seek(0)
-        return inline.read()
+        # Reuse the graph from the dialog, if the file didn't change since. Stream the chunks to dot,
+        # closing them releases the graph even if the layout fails.
+        with contextlib.closing(self.get_input(ged, cache_dir).iter_dot(root_family, config)) as dot:
+            return ged2dot.render_dot(dot, config)
 
     @staticmethod
     def __detect(input_stream: Any) -> bool:
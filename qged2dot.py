@@ -7,13 +7,28 @@
 
 """Qt-based GUI for ged2dot."""
 
-import io
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import cast
+import contextlib
+import functools
 import os
 import sys
+import threading
 import traceback
 import webbrowser
 
 from PyQt6 import QtGui
+from PyQt6.QtCore import QObject
+from PyQt6.QtCore import QStandardPaths
+from PyQt6.QtCore import QThread
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtWidgets import QCheckBox
 from PyQt6.QtWidgets import QComboBox
@@ -23,6 +38,7 @@ from PyQt6.QtWidgets import QGridLayout
 from PyQt6.QtWidgets import QLabel
 from PyQt6.QtWidgets import QLineEdit
 from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtWidgets import QProgressBar
 from PyQt6.QtWidgets import QPushButton
 from PyQt6.QtWidgets import QSpinBox
 from PyQt6.QtWidgets import QStatusBar
@@ -33,6 +49,60 @@ import pygraphviz  # type: ignore
 import ged2dot
 
 
+class Canceled(Exception):
+    """Raised in a worker thread when the user canceled its job."""
+
+
+class Worker(QObject):
+    """
+    Runs a job in a background thread, so the window stays responsive while large input is parsed
+    and laid out. The job reports its progress, and checks between its steps if it's canceled.
+    """
+    # Step, number of steps, message.
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+    # Traceback.
+    failed = pyqtSignal(str)
+    canceled = pyqtSignal()
+
+    def __init__(self, job: Callable[["Worker"], Any]) -> None:
+        super().__init__()
+        self.job = job
+        self.cancel_event = threading.Event()
+
+    def run(self) -> None:
+        """Runs the job in the thread of the worker, then emits exactly one of the result signals."""
+        try:
+            result = self.job(self)
+        except Canceled:
+            self.canceled.emit()
+            return
+        except Exception:  # pylint: disable=broad-except
+            self.failed.emit(traceback.format_exc())
+            return
+        self.finished.emit(result)
+
+    def cancel(self) -> None:
+        """Asks the job to stop, it stops at its next check."""
+        self.cancel_event.set()
+
+    def check(self) -> None:
+        """Raises Canceled if the job should stop."""
+        if self.cancel_event.is_set():
+            raise Canceled()
+
+    def report(self, step: int, steps: int, message: str) -> None:
+        """Reports that the job started its step-th step, also checks if it should stop."""
+        self.check()
+        self.progress.emit(step, steps, message)
+
+    def iter_checked(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Yields chunks, checking if the job should stop after each chunk."""
+        for chunk in chunks:
+            self.check()
+            yield chunk
+
+
 class Widgets:
     """Contains widgets which store shared state."""
     def __init__(self, window: QWidget) -> None:
@@ -42,42 +112,114 @@ class Widgets:
         self.familydepth_value = QSpinBox(window)
         self.imagedir_value = QLineEdit(window)
         self.nameorder_value = QCheckBox(window)
+        self.cache_value = QCheckBox(window)
         self.statusbar = QStatusBar()
+        self.progressbar = QProgressBar()
+        self.progressbar.hide()
+        self.statusbar.addPermanentWidget(self.progressbar)
+        # The running job, if there is one.
+        self.worker: Optional[Worker] = None
+        self.thread: Optional[QThread] = None
+        # The last input: listing its families and converting it parses it only once.
+        self.served_input: Optional[ged2dot.ServedInput] = None
+
+    def start_job(self, job: Callable[[Worker], Any], on_finished: Callable[[Any], None]) -> None:
+        """Runs job in a background thread, then calls on_finished with its result."""
+        if self.thread:
+            self.statusbar.showMessage("Wait till the current job finishes, or cancel it.")
+            return
+        self.worker = Worker(job)
+        self.thread = QThread()
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.finished.connect(self.finish_job)
+        self.worker.finished.connect(on_finished)
+        self.worker.failed.connect(self.finish_job)
+        self.worker.failed.connect(self.show_error)
+        self.worker.canceled.connect(self.finish_job)
+        self.worker.canceled.connect(lambda: self.statusbar.showMessage("Canceled."))
+        self.progressbar.setRange(0, 0)
+        self.progressbar.show()
+        self.thread.start()
+
+    def finish_job(self) -> None:
+        """Cleans up after the running job, called in the main thread."""
+        assert self.thread
+        # The worker already emitted its last signal, so this doesn't block for long.
+        self.thread.quit()
+        self.thread.wait()
+        self.thread = None
+        self.worker = None
+        self.progressbar.hide()
+
+    def cancel(self) -> None:
+        """Handler for the cancel button: cancels the running job, or quits if there is none."""
+        if not self.worker:
+            QApplication.quit()
+            return
+        self.statusbar.showMessage("Canceling...")
+        self.worker.cancel()
+
+    def stop(self) -> None:
+        """Cancels the running job and waits for it, so the thread is not destroyed while running."""
+        if not self.worker or not self.thread:
+            return
+        self.worker.cancel()
+        self.thread.quit()
+        self.thread.wait()
+
+    def show_progress(self, step: int, steps: int, message: str) -> None:
+        """Shows the progress of the running job in the status bar."""
+        self.progressbar.setRange(0, steps)
+        self.progressbar.setValue(step - 1)
+        self.statusbar.showMessage(message)
 
     def set_input(self) -> None:
         """Handler for the input button."""
-        try:
-            dialog = QFileDialog()
-            dialog.setFileMode(QFileDialog.FileMode.ExistingFile)  # pylint: disable=no-member
-            dialog.setNameFilters(["GEDCOM files (*.ged)"])
-            if not dialog.exec():
-                return
-
-            files = dialog.selectedFiles()
-            assert len(files) == 1
-            ged_path = files[0]
-            self.input_value.setText(ged_path)
-
-            import_config = {
-                'input': ged_path,
-            }
-            ged_import = ged2dot.GedcomImport()
-            graph = ged_import.load(import_config)
-            self.rootfamily_value.clear()
-            for node in graph:
-                if not isinstance(node, ged2dot.Family):
-                    continue
-                help_string = ""
-                if node.husb and node.husb.get_surname():
-                    help_string += node.husb.get_surname()
-                help_string += "-"
-                if node.wife and node.wife.get_surname():
-                    help_string += node.wife.get_surname()
-                key = f"{node.get_identifier()} ({help_string})"
-                self.rootfamily_value.addItem(key, node.get_identifier())
-            self.update_status()
-        except Exception:  # pylint: disable=broad-except
-            self.print_traceback()
+        dialog = QFileDialog()
+        dialog.setFileMode(QFileDialog.FileMode.ExistingFile)  # pylint: disable=no-member
+        dialog.setNameFilters(["GEDCOM files (*.ged)"])
+        if not dialog.exec():
+            return
+
+        files = dialog.selectedFiles()
+        assert len(files) == 1
+        ged_path = files[0]
+        self.input_value.setText(ged_path)
+        self.start_job(functools.partial(Widgets.load_families, self.get_input(ged_path)), self.set_families)
+
+    def get_input(self, ged_path: str) -> ged2dot.ServedInput:
+        """Gets the input at ged_path, which keeps its graph till the file changes."""
+        if not self.served_input or self.served_input.config["input"] != ged_path:
+            # The graph is kept in memory, so don't slow down the first parse by storing it on disk.
+            self.served_input = ged2dot.ServedInput({"input": ged_path})
+        return self.served_input
+
+    @staticmethod
+    def load_families(served_input: ged2dot.ServedInput, worker: Worker) -> List[Tuple[str, str]]:
+        """Loads the families of the input in a worker thread, for the root family combo box."""
+        worker.report(1, 1, "Loading " + served_input.config["input"] + "...")
+        nodes = served_input.get_families()
+        worker.check()
+        families: List[Tuple[str, str]] = []
+        for node in nodes:
+            help_string = ""
+            if node.husb and node.husb.get_surname():
+                help_string += node.husb.get_surname()
+            help_string += "-"
+            if node.wife and node.wife.get_surname():
+                help_string += node.wife.get_surname()
+            key = f"{node.get_identifier()} ({help_string})"
+            families.append((key, node.get_identifier()))
+        return families
+
+    def set_families(self, families: List[Tuple[str, str]]) -> None:
+        """Fills the root family combo box, once the input is loaded."""
+        self.rootfamily_value.clear()
+        for key, identifier in families:
+            self.rootfamily_value.addItem(key, identifier)
+        self.update_status()
 
     def set_output(self) -> None:
         """Handler for the output button."""
@@ -109,51 +251,86 @@ class Widgets:
         self.imagedir_value.setText(files[0])
 
     def convert(self) -> None:
-        """Does the actual conversion."""
-        try:
-            config = {
-                "input": self.input_value.text(),
-                "output": self.output_value.text(),
-                "rootfamily": self.rootfamily_value.currentData(),
-                "familydepth": str(self.familydepth_value.value()),
-                "imagedir": self.imagedir_value.text(),
-                "nameorder": "little",
-            }
-            if not self.nameorder_value.isChecked():
-                config["nameorder"] = "big"
-            invoke_dot = False
-            if not self.output_value.text().endswith(".dot"):
-                invoke_dot = True
-                config["output"] = self.output_value.text() + ".dot"
-            self.statusbar.showMessage("Converting to " + config["output"] + "...")
-            ged2dot.convert(config)
-            if invoke_dot:
-                self.statusbar.showMessage("Converting to " + self.output_value.text() + "...")
-                self.to_graphic(config["output"], self.output_value.text())
-            webbrowser.open("file://" + self.output_value.text())
-            self.statusbar.showMessage("Conversion finished successfully.")
-        except Exception:  # pylint: disable=broad-except
-            self.print_traceback()
+        """Does the actual conversion, in a worker thread."""
+        config = {
+            "input": self.input_value.text(),
+            "output": self.output_value.text(),
+            "rootfamily": self.rootfamily_value.currentData(),
+            "familydepth": str(self.familydepth_value.value()),
+            "imagedir": self.imagedir_value.text(),
+            "nameorder": "little",
+        }
+        if not self.nameorder_value.isChecked():
+            config["nameorder"] = "big"
+        if self.cache_value.isChecked():
+            # Cache the rendered output between conversions, the size of the cache is bounded by
+            # rendercachesize.
+            config["cachedir"] = self.get_cache_dir()
+        job = functools.partial(Widgets.run_conversion, self.get_input(config["input"]), config)
+        self.start_job(job, self.conversion_finished)
+
+    def conversion_finished(self, output: str) -> None:
+        """Opens the output, once the conversion is finished."""
+        webbrowser.open("file://" + output)
+        self.statusbar.showMessage("Conversion finished successfully.")
 
     @staticmethod
-    def to_graphic(dot_path: str, graphic_path: str) -> None:
-        """Convert the generated .dot further to .png/.svg, using dot."""
-        graph = pygraphviz.AGraph(dot_path)
-        if graphic_path.endswith(".png"):
-            graph.draw(graphic_path, format="png", prog="dot")
+    def get_cache_location() -> str:
+        """Gets the per-user cache directory, e.g. ~/.cache."""
+        return QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+
+    @staticmethod
+    def get_cache_dir() -> str:
+        """Gets the cache directory of ged2dot."""
+        return os.path.join(Widgets.get_cache_location(), "ged2dot")
+
+    @staticmethod
+    def run_conversion(served_input: ged2dot.ServedInput, config: Dict[str, str], worker: Worker) -> str:
+        """
+        Converts to .dot/.png/.svg in a worker thread, without writing a .dot file for graphic
+        output. The graph of served_input is reused, unless the input changed. Returns the output
+        path.
+        """
+        if config["output"].endswith(".dot"):
+            config["format"] = "dot"
+            steps = 2
+        elif config["output"].endswith(".png"):
+            config["format"] = "png"
+            steps = 3
         else:
-            graph.draw(graphic_path, format="svg", prog="dot")
+            config["format"] = "svg"
+            steps = 3
+        worker.report(1, steps, "Loading " + config["input"] + "...")
+        served_input.load()
+        worker.report(2, steps, "Exporting...")
+
+        def layout(chunks: Iterable[bytes], image_format: str) -> bytes:
+            dot = b"".join(chunks)
+            worker.report(3, steps, "Laying out...")
+            return Widgets.layout([dot], image_format)
+        layout_version = "pygraphviz " + pygraphviz.__version__ + " graphviz " + pygraphviz.__graphviz_version__
+        # Check between chunks, so a cancel doesn't wait for the whole export. Closing the chunks
+        # releases the graph even then.
+        with contextlib.closing(served_input.iter_dot(config["rootfamily"], config)) as dot:
+            output = ged2dot.render_dot(worker.iter_checked(dot), config, layout, layout_version)
+        worker.check()
+        with open(config["output"], "wb") as stream:
+            stream.write(output)
+        return config["output"]
 
     @staticmethod
-    def print_traceback() -> None:
-        """Shows the exception to the user when it would not be caught."""
+    def layout(chunks: Iterable[bytes], image_format: str) -> bytes:
+        """Lays out DOT in-process with pygraphviz, which works with the bundled Graphviz."""
+        graph = pygraphviz.AGraph(string=b"".join(chunks).decode("utf-8"))
+        return cast(bytes, graph.draw(format=image_format, prog="dot"))
+
+    def show_error(self, details: str) -> None:
+        """Shows the traceback of an exception in a worker thread to the user."""
+        self.statusbar.showMessage("Conversion failed.")
         msg = QMessageBox()
         msg.setIcon(QMessageBox.Icon.Warning)  # pylint: disable=no-member
         msg.setText("Conversion failed.")
-        with io.StringIO() as stream:
-            traceback.print_exc(file=stream)
-            stream.seek(0)
-            msg.setDetailedText(stream.read())
+        msg.setDetailedText(details)
         msg.exec()
 
     def update_status(self) -> None:
@@ -233,6 +410,14 @@ class Application:
         self.widgets.nameorder_value.setChecked(True)
         self.grid_layout.addWidget(self.widgets.nameorder_value, 5, 1)
 
+    def setup_cache(self) -> None:
+        """Sets up the cache row."""
+        cache_key = QLabel(self.window)
+        cache_key.setText("Cache:")
+        self.grid_layout.addWidget(cache_key, 6, 0)
+        self.widgets.cache_value.setText("Keep up to 100 MiB of rendered charts in " + self.widgets.get_cache_dir())
+        self.grid_layout.addWidget(self.widgets.cache_value, 6, 1)
+
     def exec(self) -> None:
         """Starts the main loop."""
         self.window.setWindowTitle("ged2dot")
@@ -240,6 +425,7 @@ class Application:
         self.window.setWindowIcon(QtGui.QIcon(icon_path))
         self.window.setLayout(self.layout)
         self.window.show()
+        self.qt_app.aboutToQuit.connect(self.widgets.stop)
         sys.exit(self.qt_app.exec())
 
 
@@ -252,6 +438,7 @@ def main() -> None:
     app.setup_familydepth()
     app.setup_imagedir()
     app.setup_nameorder()
+    app.setup_cache()
 
     app.layout.addLayout(app.grid_layout)
 
@@ -261,7 +448,7 @@ def main() -> None:
     app.layout.addWidget(button_box)
     cancel_button = button_box.button(QDialogButtonBox.StandardButton.Cancel)
     assert cancel_button
-    cancel_button.clicked.connect(sys.exit)
+    cancel_button.clicked.connect(app.widgets.cancel)
     ok_button = button_box.button(QDialogButtonBox.StandardButton.Ok)
     assert ok_button
     ok_button.clicked.connect(app.widgets.convert)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+
+"""Caches the output of Graphviz layouts on disk."""
+
+from typing import Callable
+from typing import Iterable
+import hashlib
+import os
+import re
+import threading
+
+
+class RenderCache:
+    """
+    Stores the output of a layout on disk, keyed by a hash of the DOT, the mtime and size of the
+    images it refers to, the output format and the Graphviz version, so an unchanged chart is not laid
+    out again. When the cache grows above its size limit, the least recently used outputs are removed.
+    """
+    def __init__(self, cache_dir: str, max_size: int, version: str,
+                 layout: Callable[[Iterable[bytes], str], bytes]) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.version = version
+        self.wrapped_layout = layout
+
+    def layout(self, chunks: Iterable[bytes], image_format: str) -> bytes:
+        """Same as the wrapped layout, but looks up the output in the cache first."""
+        # The whole DOT is needed for the hash before the layout can start.
+        dot = list(chunks)
+        digest = hashlib.sha256()
+        for chunk in dot:
+            digest.update(chunk)
+        # dot embeds raster images into e.g. PNG output, so a replaced photo needs a new layout.
+        paths = set(re.findall(rb'<img [^>]*src="([^"]*)"', b"".join(dot)))
+        for path in sorted(paths):
+            digest.update(b"\0" + path + b"\0" + self.__get_image_key(path))
+        digest.update(("\0" + image_format + "\0" + self.version).encode("utf-8"))
+        path = os.path.join(self.cache_dir, f"ged2dot-render-{digest.hexdigest()}.{image_format}")
+        try:
+            with open(path, "rb") as stream:
+                output = stream.read()
+        except OSError:
+            output = None
+        if output is not None:
+            try:
+                # The modification time tracks the last use.
+                os.utime(path)
+            except OSError:
+                # A read-only cache still has hits, the file is just not kept longer.
+                pass
+            return output
+
+        output = self.wrapped_layout(dot, image_format)
+        try:
+            self.__store(path, output)
+        except OSError:
+            # The cache is just an optimization.
+            pass
+        return output
+
+    @staticmethod
+    def __get_image_key(path: bytes) -> bytes:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return b""
+        return f"{stat.st_mtime_ns} {stat.st_size}".encode("utf-8")
+
+    def __store(self, path: str, output: bytes) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_path, "wb") as stream:
+            stream.write(output)
+        os.replace(temp_path, path)
+
+        entries = []
+        size = 0
+        with os.scandir(self.cache_dir) as iterator:
+            for entry in iterator:
+                if entry.name.startswith("ged2dot-render-") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    size += stat.st_size
+        for _mtime, entry_size, entry_path in sorted(entries):
+            if size <= self.max_size:
+                break
+            os.remove(entry_path)
+            size -= entry_size
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab:
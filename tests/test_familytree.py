@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""The test_familytree module covers the familytree module."""
+
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+import io
+import os
+import unittest
+import unittest.mock
+
+import familytree
+import ged2dot
+
+
+class TestIndividual(unittest.TestCase):
+    """Tests Individual."""
+    def test_nosex(self) -> None:
+        """Tests the no sex case."""
+        config = {
+            "familydepth": "4",
+            "input": "tests/nosex.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize(config)
+        individual = familytree.graph_find(graph, "42")
+        assert individual is None
+        individual = familytree.graph_find(graph, "P3")
+        assert individual
+        assert isinstance(individual, familytree.Individual)
+        self.assertIn("placeholder-u", individual.get_label("tests/images", "little", "{}-", basepath=""))
+        self.assertEqual(individual.get_color(), "black")
+
+    def test_big_endian_name(self) -> None:
+        """Tests the case when the name starts with the family name."""
+        config = {
+            "input": "tests/hello.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize(config)
+        individual = familytree.graph_find(graph, "P1")
+        assert individual
+        assert isinstance(individual, familytree.Individual)
+        label = individual.get_label(image_dir="", name_order="big", birth_format="{}-", basepath="")
+        self.assertIn("A<br/>Alice", label)
+
+    def test_name_suffix(self) -> None:
+        """Tests the case when the name has a suffix."""
+        config = {
+            "input": "tests/suffix.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize(config)
+        individual = familytree.graph_find(graph, "P1")
+        assert individual
+        assert isinstance(individual, familytree.Individual)
+        label = individual.get_label(image_dir="", name_order="little", birth_format="{}-", basepath="")
+        self.assertIn("Alice<br/>A Suffix", label)
+
+    def test_occupation(self) -> None:
+        """Tests the case when the occupation is provided."""
+        config = {
+            "input": "tests/occupation.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize(config)
+        individual = familytree.graph_find(graph, "P1")
+        assert individual
+        assert isinstance(individual, familytree.Individual)
+        label = individual.get_label(image_dir="", name_order="little", birth_format="{}-", basepath="")
+        self.assertIn("Alice<br/>A<br/>-<br/>myoccupation", label)
+
+    def test_str(self) -> None:
+        """Tests __str()__."""
+        config = {
+            "input": "tests/hello.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize(config)
+        individual = familytree.graph_find(graph, "P1")
+        # Make sure that this doesn't loop.
+        self.assertNotEqual(str(individual), "")
+
+    def test_compact(self) -> None:
+        """Tests that individuals have no per-instance dict and share repeated strings."""
+        config = {
+            "input": "tests/happy.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.load(config)
+        individual = familytree.graph_find(graph, "P48")
+        assert isinstance(individual, familytree.Individual)
+        self.assertFalse(hasattr(individual, "__dict__"))
+        self.assertFalse(hasattr(individual.get_config(), "__dict__"))
+        other = familytree.graph_find(graph, "P158")
+        assert isinstance(other, familytree.Individual)
+        self.assertEqual(individual.get_surname(), other.get_surname())
+        self.assertIs(individual.get_surname(), other.get_surname())
+        self.assertIs(individual.get_sex(), other.get_sex())
+        family = individual.fams_list[0]
+        self.assertFalse(hasattr(family, "__dict__"))
+        self.assertIs(individual.fams_ids[0], family.get_identifier())
+
+
+class TestFamily(unittest.TestCase):
+    """Tests Family."""
+    def test_str(self) -> None:
+        """Tests __str()__."""
+        config = {
+            "input": "tests/hello.ged",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize(config)
+        family = familytree.graph_find(graph, "F1")
+        # Make sure that this doesn't loop.
+        self.assertNotEqual(str(family), "")
+
+
+def get_chain_gedcom(family_count: int) -> bytes:
+    """Generates a gedcom where each family's son is the husband in the next family."""
+    lines = ["0 HEAD"]
+    for index in range(family_count):
+        husband = f"P{index}"
+        wife = f"W{index}"
+        lines += [f"0 @{husband}@ INDI", f"1 NAME {husband} /Chain/", "1 SEX M"]
+        if index:
+            lines.append(f"1 FAMC @F{index - 1}@")
+        lines.append(f"1 FAMS @F{index}@")
+        lines += [f"0 @{wife}@ INDI", f"1 NAME {wife} /Other/", "1 SEX F", f"1 FAMS @F{index}@"]
+        lines += [f"0 @F{index}@ FAM", f"1 HUSB @{husband}@", f"1 WIFE @{wife}@"]
+        if index + 1 < family_count:
+            lines.append(f"1 CHIL @P{index + 1}@")
+    lines.append("0 TRLR")
+    return "\r\n".join(lines).encode("utf-8")
+
+
+class TestGraph(unittest.TestCase):
+    """Tests Graph."""
+    def test_duplicated_identifier(self) -> None:
+        """Tests that the first node wins in case the input has duplicated identifiers."""
+        graph = familytree.Graph()
+        first = familytree.Individual()
+        first.set_identifier("P1")
+        graph.append(first)
+        second = familytree.Individual()
+        second.set_identifier("P1")
+        graph.append(second)
+        self.assertEqual(len(graph), 2)
+        self.assertIs(graph.find("P1"), first)
+        self.assertIsNone(graph.find(""))
+
+    def test_load_scaling(self) -> None:
+        """Tests that load() is linear in the size of the input: a constant number of lookups per node."""
+        class CountingIndex(Dict[str, familytree.Node]):
+            """Counts lookups in the index."""
+            lookups = 0
+
+            def get(self, *args: Any, **kwargs: Any) -> Any:
+                CountingIndex.lookups += 1
+                return super().get(*args, **kwargs)
+
+        class CountingNodes(List[familytree.Node]):
+            """Counts scans of the nodes, a linear lookup would scan them again."""
+            scans = 0
+
+            def __iter__(self) -> Iterator[familytree.Node]:
+                CountingNodes.scans += 1
+                return super().__iter__()
+
+        lookups_per_family: List[float] = []
+        for family_count in [1000, 8000]:
+            graph = ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(get_chain_gedcom(family_count)))
+            self.assertEqual(len(graph), family_count * 3)
+            graph.index = CountingIndex(graph.index)
+            graph.nodes = CountingNodes(graph.nodes)
+            CountingIndex.lookups = 0
+            CountingNodes.scans = 0
+            graph.resolve()
+            # Only resolve() itself walks the nodes, lookups use the index.
+            self.assertEqual(CountingNodes.scans, 1)
+            lookups_per_family.append(CountingIndex.lookups / family_count)
+        # Husband and wife: famc and fams, family: husb, wife and chil, regardless of the size.
+        for lookups in lookups_per_family:
+            self.assertLessEqual(lookups, 7)
+        self.assertAlmostEqual(lookups_per_family[0], lookups_per_family[1], delta=0.01)
+
+
+class TestCsrGraph(unittest.TestCase):
+    """Tests CsrGraph."""
+    def test_same_output(self) -> None:
+        """Tests that the output is the same as with the default backend."""
+        for direction in ["both", "child"]:
+            outputs = []
+            for backend in ["objects", "csr"]:
+                config = {
+                    "familydepth": "4",
+                    "input": "tests/happy.ged",
+                    "rootfamily": "F1",
+                    "direction": direction,
+                    "backend": backend,
+                }
+                importer = ged2dot.GedcomImport()
+                graph = importer.load(config)
+                root_family = graph.find(config["rootfamily"])
+                assert root_family
+                subgraph = familytree.bfs(root_family, config)
+                stream = io.BytesIO()
+                ged2dot.DotExport().store_to_stream(subgraph, stream, config)
+                outputs.append(stream.getvalue())
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_materialize_subgraph(self) -> None:
+        """Tests that only the visited part of the graph is turned into node objects."""
+        config = {
+            "familydepth": "0",
+            "input": "tests/happy.ged",
+            "backend": "csr",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.load(config)
+        assert isinstance(graph, familytree.CsrGraph)
+        root_family = graph.find("F1")
+        assert isinstance(root_family, familytree.Family)
+        self.assertIsNone(root_family.wife)
+        subgraph = familytree.bfs(root_family, config)
+        self.assertEqual(len(subgraph), 3)
+        self.assertEqual(root_family.get_wife_id(), "P65")
+        assert root_family.wife
+        self.assertEqual(root_family.wife.get_forename(), "Elizabeth")
+        # The root family, its wife and husband, and their families.
+        self.assertLess(len(graph.materialized), 10)
+        self.assertGreater(len(graph), 50)
+
+    def test_find(self) -> None:
+        """Tests find() and iteration."""
+        config = {
+            "input": "tests/no_husband.ged",
+            "backend": "csr",
+        }
+        importer = ged2dot.GedcomImport()
+        graph = importer.load(config)
+        self.assertIsNone(graph.find(""))
+        self.assertIsNone(graph.find("F42"))
+        family = graph.find("F1")
+        self.assertIs(graph.find("F1"), family)
+        assert isinstance(family, familytree.Family)
+        self.assertEqual(family.get_husb_id(), "")
+        self.assertEqual([i.get_identifier() for i in family.get_neighbours("both")], ["P1"])
+        self.assertEqual(len(list(graph)), len(graph))
+        individual = graph.find("P1")
+        assert isinstance(individual, familytree.Individual)
+        self.assertEqual(individual.get_famc_id(), "")
+        self.assertEqual(individual.fams_ids, ["F1"])
+
+
+class TestSubgraphIndex(unittest.TestCase):
+    """Tests SubgraphIndex."""
+    def test_happy(self) -> None:
+        """Tests that the index gives the same subgraphs as bfs()."""
+        graph = familytree.to_csr_graph(ged2dot.GedcomImport().load({"input": "tests/happy.ged"}, lazy=True))
+        index = familytree.SubgraphIndex(graph, max_family_depth=2)
+        self.assertGreater(index.get_size(), 0)
+        # Deeper than the index or a different direction: traverses the graph.
+        for family_depth in range(4):
+            for direction in ["both", "child"]:
+                config = {"familydepth": str(family_depth), "direction": direction}
+                for root_family in graph.get_family_ids():
+                    root = graph.find(root_family)
+                    assert root
+                    self.assertEqual(index.get_subgraph(root_family, config), familytree.bfs(root, config))
+
+    def test_dot(self) -> None:
+        """Tests that the DOT exported from the index is the same as the one from bfs()."""
+        config = {"familydepth": "2", "direction": "both", "rootfamily": "F1"}
+        graph = familytree.to_csr_graph(ged2dot.GedcomImport().load({"input": "tests/happy.ged"}, lazy=True))
+        # Export from the index first, so no traversal resolved the nodes already.
+        index = familytree.SubgraphIndex(graph, max_family_depth=2)
+        actual = b"".join(ged2dot.DotExport().iter_dot(index.get_subgraph("F1", config), config))
+        expected_graph = ged2dot.GedcomImport().load({"input": "tests/happy.ged"})
+        root = expected_graph.find("F1")
+        assert root
+        expected = b"".join(ged2dot.DotExport().iter_dot(familytree.bfs(root, config), config))
+        self.assertIn(b" -> ", expected)
+        self.assertEqual(actual, expected)
+
+    def test_missing(self) -> None:
+        """Tests that the root must be a family."""
+        graph = familytree.to_csr_graph(ged2dot.GedcomImport().load({"input": "tests/happy.ged"}, lazy=True))
+        index = familytree.SubgraphIndex(graph, max_family_depth=1, direction="child")
+        config = {"familydepth": "1"}
+        for root_family in ["P1", "F0"]:
+            with self.assertRaises(familytree.Ged2DotException):
+                index.get_subgraph(root_family, config)
+
+
+class TestGetAbspath(unittest.TestCase):
+    """Tests get_abspath()."""
+    def test_happy(self) -> None:
+        """Tests the happy path."""
+        self.assertEqual(familytree.get_abspath("foo"), os.path.join(os.getcwd(), "foo"))
+
+    def test_abs(self) -> None:
+        """Tests the case when the input is abs already."""
+        abspath = os.path.join(os.getcwd(), "foo")
+        self.assertEqual(familytree.get_abspath(abspath), abspath)
+
+
+if __name__ == '__main__':
+    unittest.main()
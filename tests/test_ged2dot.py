@@ -6,101 +6,28 @@
 
 """The test_ged2dot module covers the ged2dot module."""
 
+from typing import Any
 from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import cast
+import concurrent.futures
 import io
 import os
+import shutil
+import sys
+import tempfile
+import threading
 import unittest
 import unittest.mock
-import xml.etree.ElementTree as ET
-
-import pygraphviz  # type: ignore
+import urllib.error
+import urllib.request
 
+import familytree
 import ged2dot
 
 
-class TestIndividual(unittest.TestCase):
-    """Tests Individual."""
-    def test_nosex(self) -> None:
-        """Tests the no sex case."""
-        config = {
-            "familydepth": "4",
-            "input": "tests/nosex.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.tokenize(config)
-        individual = ged2dot.graph_find(graph, "42")
-        assert individual is None
-        individual = ged2dot.graph_find(graph, "P3")
-        assert individual
-        assert isinstance(individual, ged2dot.Individual)
-        self.assertIn("placeholder-u", individual.get_label("tests/images", "little", "{}-", basepath=""))
-        self.assertEqual(individual.get_color(), "black")
-
-    def test_big_endian_name(self) -> None:
-        """Tests the case when the name starts with the family name."""
-        config = {
-            "input": "tests/hello.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.tokenize(config)
-        individual = ged2dot.graph_find(graph, "P1")
-        assert individual
-        assert isinstance(individual, ged2dot.Individual)
-        label = individual.get_label(image_dir="", name_order="big", birth_format="{}-", basepath="")
-        self.assertIn("A<br/>Alice", label)
-
-    def test_name_suffix(self) -> None:
-        """Tests the case when the name has a suffix."""
-        config = {
-            "input": "tests/suffix.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.tokenize(config)
-        individual = ged2dot.graph_find(graph, "P1")
-        assert individual
-        assert isinstance(individual, ged2dot.Individual)
-        label = individual.get_label(image_dir="", name_order="little", birth_format="{}-", basepath="")
-        self.assertIn("Alice<br/>A Suffix", label)
-
-    def test_occupation(self) -> None:
-        """Tests the case when the occupation is provided."""
-        config = {
-            "input": "tests/occupation.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.tokenize(config)
-        individual = ged2dot.graph_find(graph, "P1")
-        assert individual
-        assert isinstance(individual, ged2dot.Individual)
-        label = individual.get_label(image_dir="", name_order="little", birth_format="{}-", basepath="")
-        self.assertIn("Alice<br/>A<br/>-<br/>myoccupation", label)
-
-    def test_str(self) -> None:
-        """Tests __str()__."""
-        config = {
-            "input": "tests/hello.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.tokenize(config)
-        individual = ged2dot.graph_find(graph, "P1")
-        # Make sure that this doesn't loop.
-        self.assertNotEqual(str(individual), "")
-
-
-class TestFamily(unittest.TestCase):
-    """Tests Family."""
-    def test_str(self) -> None:
-        """Tests __str()__."""
-        config = {
-            "input": "tests/hello.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.tokenize(config)
-        family = ged2dot.graph_find(graph, "F1")
-        # Make sure that this doesn't loop.
-        self.assertNotEqual(str(family), "")
-
-
 class TestGedcomImport(unittest.TestCase):
     """Tests GedcomImport."""
     def test_no_surname(self) -> None:
@@ -111,9 +38,9 @@ class TestGedcomImport(unittest.TestCase):
         }
         importer = ged2dot.GedcomImport()
         graph = importer.tokenize(config)
-        individual = ged2dot.graph_find(graph, "P1")
+        individual = familytree.graph_find(graph, "P1")
         assert individual
-        assert isinstance(individual, ged2dot.Individual)
+        assert isinstance(individual, familytree.Individual)
         self.assertEqual(individual.get_surname(), "")
         self.assertEqual(individual.get_forename(), "Alice")
 
@@ -125,10 +52,79 @@ class TestGedcomImport(unittest.TestCase):
         }
         importer = ged2dot.GedcomImport()
         graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
+        root_family = familytree.graph_find(graph, "F1")
         assert root_family
-        subgraph = ged2dot.bfs(root_family, config)
+        subgraph = familytree.bfs(root_family, config)
         self.assertEqual(len(subgraph), 3)
+        # Multi-digit levels are ignored as well.
+        graph = ged2dot.GedcomImport().tokenize_lines([b"0 @P1@ INDI", b"1 NAME A /B/", b"10 NAME C /D/", b"0 TRLR"])
+        individual = graph.find("P1")
+        assert isinstance(individual, familytree.Individual)
+        self.assertEqual(individual.get_surname(), "B")
+
+    def test_lazy(self) -> None:
+        """Tests that lazy loading only resolves the visited nodes, with the same result."""
+        config = {
+            "familydepth": "1",
+            "input": "tests/happy.ged",
+        }
+        eager_graph = ged2dot.GedcomImport().load(config)
+        eager_root = eager_graph.find("F1")
+        assert eager_root
+        expected = [i.get_identifier() for i in familytree.bfs(eager_root, config)]
+
+        graph = ged2dot.GedcomImport().load(config, lazy=True)
+        root_family = graph.find("F1")
+        assert isinstance(root_family, familytree.Family)
+        self.assertIsNone(root_family.wife)
+        actual = [i.get_identifier() for i in familytree.bfs(root_family, config)]
+        self.assertEqual(actual, expected)
+        self.assertIsNotNone(root_family.wife)
+        unresolved = [i for i in graph if i.lazy_graph is not None]
+        self.assertGreater(len(unresolved), len(graph) // 2)
+
+    def test_misplaced_tags(self) -> None:
+        """Tests that tags in the wrong kind of record are ignored."""
+        lines = [
+            "0 HEAD",
+            "1 SEX M",
+            "0 @F1@ FAM",
+            "1 NAME Alice /Smith/",
+            "1 SEX F",
+            "1 FAMC @F2@",
+            "1 FAMS @F2@",
+            "1 NOTE foo",
+            "1 OCCU bar",
+            "0 @P1@ INDI",
+            "1 HUSB @P2@",
+            "1 WIFE @P3@",
+            "1 CHIL @P4@",
+            "1 MARR",
+            "2 DATE 1900",
+            "0 TRLR",
+        ]
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize_from_stream(io.BytesIO("\n".join(lines).encode("utf-8")))
+        family = graph.find("F1")
+        assert isinstance(family, familytree.Family)
+        self.assertEqual(str(family), "Family(identifier=F1, marr: , wife_id: , husb_id: , child_ids: [], depth: 0)")
+        individual = graph.find("P1")
+        assert isinstance(individual, familytree.Individual)
+        self.assertEqual(individual.get_famc_id(), "")
+        self.assertEqual(individual.fams_ids, [])
+        self.assertEqual(individual.get_config().get_birth(), "")
+
+    def test_invalid_utf8(self) -> None:
+        """Tests that invalid UTF-8 is only an error in the values we use."""
+        importer = ged2dot.GedcomImport()
+        graph = importer.tokenize_from_stream(io.BytesIO(b"0 @P1@ INDI\n1 SOUR \xff\n1 NAME Alice /Smith/\n0 TRLR\n"))
+        individual = graph.find("P1")
+        assert isinstance(individual, familytree.Individual)
+        self.assertEqual(individual.get_forename(), "Alice")
+
+        importer = ged2dot.GedcomImport()
+        with self.assertRaises(ged2dot.Ged2DotException):
+            importer.tokenize_from_stream(io.BytesIO(b"0 @P1@ INDI\n1 NAME \xff\n"))
 
     def test_unexpected_date(self) -> None:
         """Tests that we just ignore a date which is not birth/death."""
@@ -138,519 +134,564 @@ class TestGedcomImport(unittest.TestCase):
         }
         importer = ged2dot.GedcomImport()
         graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
+        root_family = familytree.graph_find(graph, "F1")
         assert root_family
-        subgraph = ged2dot.bfs(root_family, config)
+        subgraph = familytree.bfs(root_family, config)
         self.assertEqual(len(subgraph), 3)
 
 
+def get_dot(graph: familytree.Graph, config: Dict[str, str]) -> bytes:
+    """Exports the subgraph around the root family of config to a DOT string."""
+    root_family = graph.find(config["rootfamily"])
+    assert root_family
+    subgraph = familytree.bfs(root_family, config)
+    stream = io.BytesIO()
+    ged2dot.DotExport().store_to_stream(subgraph, stream, config)
+    return stream.getvalue()
+
+
+class TestIterLines(unittest.TestCase):
+    """Tests iter_lines()."""
+    def test_chunk_boundaries(self) -> None:
+        """Tests that lines are the same, regardless of where chunks end."""
+        for chunk_size in range(1, 8):
+            stream = io.BytesIO(b"0 HEAD\r\n1 NOTE a\nb\r\n0 TRLR")
+            lines = list(ged2dot.iter_lines(stream, chunk_size))
+            self.assertEqual(lines, [b"0 HEAD", b"1 NOTE a\nb", b"0 TRLR"])
+            stream = io.BytesIO(b"0 HEAD\n0 TRLR\n")
+            lines = list(ged2dot.iter_lines(stream, chunk_size))
+            self.assertEqual(lines, [b"0 HEAD", b"0 TRLR"])
+
+    def test_gedcom_files(self) -> None:
+        """Tests that small chunks give the same graph as a single chunk for all test files."""
+        for name in sorted(os.listdir("tests")):
+            if not name.endswith(".ged"):
+                continue
+            with open(os.path.join("tests", name), "rb") as stream:
+                buf = stream.read()
+            expected = [str(i) for i in ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(buf))]
+            actual = [str(i) for i in ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(buf), chunk_size=5)]
+            self.assertEqual(actual, expected)
+
+
+class TestTokenizeParallel(unittest.TestCase):
+    """Tests GedcomImport.tokenize_parallel()."""
+    def test_iter_records(self) -> None:
+        """Tests that chunks are split at record boundaries."""
+        for chunk_size in range(1, 20):
+            stream = io.BytesIO(b"0 HEAD\r\n0 @P1@ INDI\r\n1 NOTE a\n0 b\r\n0 TRLR\r\n")
+            records = list(ged2dot.iter_records(stream, chunk_size))
+            lines = [line for chunk, separator in records for line in chunk.split(separator)]
+            self.assertEqual(lines, [b"0 HEAD", b"0 @P1@ INDI", b"1 NOTE a\n0 b", b"0 TRLR", b""])
+            for chunk, _separator in records[:-1]:
+                self.assertTrue(chunk.endswith(b"HEAD") or chunk.endswith(b"0 b"))
+        stream = io.BytesIO(b"0 HEAD")
+        self.assertEqual(list(ged2dot.iter_records(stream, 1024)), [(b"0 HEAD", b"\n")])
+        self.assertEqual(list(ged2dot.iter_records(io.BytesIO(), 1024)), [])
+
+    def test_tokenize_records(self) -> None:
+        """Tests that the last, possibly incomplete record is returned separately."""
+        nodes, open_node = ged2dot.tokenize_records(b"0 @P1@ INDI\n1 NAME A /B/\n0 @F1@ FAM\n1 HUSB @P1@", b"\n")
+        self.assertEqual([i.get_identifier() for i in nodes], ["P1"])
+        assert isinstance(open_node, familytree.Family)
+        self.assertEqual(open_node.get_husb_id(), "P1")
+
+    def test_same_graph(self) -> None:
+        """Tests that the result is the same as with a single process."""
+        for name in ["happy.ged", "multiline-note.ged", "no-cr.ged", "bom.ged"]:
+            with open(os.path.join("tests", name), "rb") as stream:
+                buf = stream.read()
+            expected = ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(buf))
+            for chunk_size in [64, 1024 * 1024]:
+                actual = ged2dot.GedcomImport().tokenize_parallel(io.BytesIO(buf), jobs=2, chunk_size=chunk_size)
+                self.assertEqual([str(i) for i in actual], [str(i) for i in expected])
+                for node in expected:
+                    if not isinstance(node, familytree.Individual):
+                        continue
+                    individual = actual.find(node.get_identifier())
+                    assert isinstance(individual, familytree.Individual)
+                    self.assertEqual(individual.get_config().get_note(), node.get_config().get_note())
+                    self.assertEqual(individual.get_config().get_birth(), node.get_config().get_birth())
+
+    def test_bounded(self) -> None:
+        """Tests that only a few chunks are read ahead."""
+        in_flight: List[int] = []
+
+        class MockFuture(concurrent.futures.Future):  # type: ignore
+            """Counts the futures which are waited for."""
+            def result(self, timeout: Optional[float] = None) -> Any:
+                in_flight[-1] -= 1
+                return super().result(timeout)
+
+        class MockExecutor(concurrent.futures.ThreadPoolExecutor):
+            """Runs the chunks in the current process, counting the chunks in flight."""
+            def __init__(self, max_workers: int) -> None:
+                super().__init__(max_workers)
+                in_flight.append(0)
+
+            def submit(self, fn: Any, /, *args: Any, **kwargs: Any) -> MockFuture:
+                future = MockFuture()
+                future.set_result(fn(*args, **kwargs))
+                in_flight[-1] += 1
+                in_flight.append(in_flight[-1])
+                return future
+        with open("tests/happy.ged", "rb") as stream:
+            buf = stream.read()
+        expected = ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(buf))
+        with unittest.mock.patch('concurrent.futures.ProcessPoolExecutor', MockExecutor):
+            actual = ged2dot.GedcomImport().tokenize_parallel(io.BytesIO(buf), jobs=2, chunk_size=64)
+        self.assertEqual([str(i) for i in actual], [str(i) for i in expected])
+        self.assertGreater(len(in_flight), 10)
+        self.assertEqual(max(in_flight), 4)
+
+    def test_convert(self) -> None:
+        """Tests that the jobs option results in the same output."""
+        config = {
+            "familydepth": "4",
+            "input": "tests/happy.ged",
+            "rootfamily": "F1",
+        }
+        expected = get_dot(ged2dot.GedcomImport().load(config), config)
+        config["jobs"] = "2"
+        self.assertEqual(get_dot(ged2dot.GedcomImport().load(config), config), expected)
+
+
 class BufferHolder:
     """Mock for sys.stdin."""
     def __init__(self) -> None:
         self.buffer = io.BytesIO()
 
 
-class TestMain(unittest.TestCase):
-    """Tests main(), first test set."""
-    def test_happy(self) -> None:
-        """Tests the happy path."""
+class TestBatchConvert(unittest.TestCase):
+    """Tests batch_convert()."""
+    def test_all(self) -> None:
+        """Tests that exporting all families gives the same output as exporting them one by one."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "output": os.path.join(temp_dir, "{rootfamily}.dot"),
+                "rootfamilies": "all",
+            }
+            paths = ged2dot.batch_convert(config)
+            self.assertEqual(len(paths), 25)
+            self.assertEqual(paths[0], os.path.join(temp_dir, "F152.dot"))
+            for root_family in ["F1", "F152"]:
+                config["rootfamily"] = root_family
+                config["output"] = os.path.join(temp_dir, "expected.dot")
+                ged2dot.convert(config)
+                with open(config["output"], "rb") as expected:
+                    with open(os.path.join(temp_dir, root_family + ".dot"), "rb") as actual:
+                        self.assertEqual(actual.read(), expected.read())
+
+    def test_jobs(self) -> None:
+        """Tests that exporting in parallel gives the same output."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "output": os.path.join(temp_dir, "{rootfamily}-1.dot"),
+                "rootfamilies": "F1, F6,F7",
+            }
+            paths = ged2dot.batch_convert(config)
+            self.assertEqual(len(paths), 3)
+            config["jobs"] = "2"
+            config["output"] = os.path.join(temp_dir, "{rootfamily}-2.dot")
+            self.assertEqual(ged2dot.batch_convert(config), [path.replace("-1", "-2") for path in paths])
+            for path in paths:
+                with open(path, "rb") as expected:
+                    with open(path.replace("-1", "-2"), "rb") as actual:
+                        self.assertEqual(actual.read(), expected.read())
+
+    def test_worker(self) -> None:
+        """Tests the worker process functions in-process."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "output": os.path.join(temp_dir, "{rootfamily}.dot"),
+            }
+            graph = familytree.to_csr_graph(ged2dot.GedcomImport().load(config))
+            ged2dot.init_batch_worker(graph.to_tuple())
+            self.assertEqual(ged2dot.export_family_in_worker("F1", config), os.path.join(temp_dir, "F1.dot"))
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, "F1.dot")))
+
+    def test_missing(self) -> None:
+        """Tests the error handling for a missing root family or output template."""
         config = {
             "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/happy.dot",
-            "rootfamily": "F1",
-            "imagedir": "images",
+            "output": "tests/{rootfamily}.dot",
+            "rootfamilies": "F1,P1",
         }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-        with open(config["output"], "r", encoding="utf-8") as dot_stream:
-            graph = pygraphviz.AGraph(string=dot_stream.read())
-        person = graph.get_node("P48")
-        stream = io.StringIO(person.attr.get("label"))
-        tree = ET.parse(stream)
-        root = tree.getroot()
-        row = root.find("tr")
-        assert row is not None
-        cell = row.find("td")
-        assert cell is not None
-        img = cell.find("img")
-        assert img is not None
-        actual_src = img.attrib.get("src")
-        expected_src = os.path.join(os.getcwd(), "tests", "images", "Richard Smith Y.jpg")
-        self.assertEqual(actual_src, expected_src)
-
-    def test_image_abspath(self) -> None:
-        """Tests the case when imagedir is an abs path already."""
+        with self.assertRaises(ged2dot.Ged2DotException):
+            ged2dot.batch_convert(config)
+        config["output"] = "tests/output.dot"
+        with self.assertRaises(ged2dot.Ged2DotException):
+            ged2dot.batch_convert(config)
+
+
+def create_fake_dot(directory: str, exit_code: int = 0) -> str:
+    """
+    Creates an executable which acts like dot: it writes an SVG referring to an image, and counts
+    the layouts in a 'layouts' file.
+    """
+    path = os.path.join(directory, "dot")
+    with open(path, "w", encoding="utf-8") as stream:
+        stream.write(f"""#!{sys.executable}
+import sys
+if sys.argv[1] == "-V":
+    sys.stderr.write("dot - graphviz version fake")
+    sys.exit(0)
+assert sys.argv[1].startswith("-T")
+with open({os.path.join(directory, "layouts")!r}, "a") as stream:
+    stream.write("x")
+assert sys.stdin.buffer.read().startswith(b"// Generated by ")
+with open("tests/linked.svg", "rb") as stream:
+    sys.stdout.buffer.write(stream.read())
+sys.exit({exit_code})
+""")
+    os.chmod(path, 0o755)
+    return path
+
+
+class TestRender(unittest.TestCase):
+    """Tests render()."""
+    def test_dot(self) -> None:
+        """Tests that the dot format gives the DOT output."""
         config = {
             "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/image-abspath.dot",
             "rootfamily": "F1",
-            "imagedir": os.path.join(os.getcwd(), "tests/images"),
+            "output": "-",
+            "format": "dot",
         }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-        with open(config["output"], "r", encoding="utf-8") as stream:
-            self.assertIn(config["imagedir"], stream.read())
-
-    def test_config(self) -> None:
-        """Tests the case when there is a ged2dotrc in the current dir."""
-        pwd = os.getcwd()
-        os.chdir("tests/config")
-        try:
-            if os.path.exists("hello.dot"):
-                os.unlink("hello.dot")
-            self.assertFalse(os.path.exists("hello.dot"))
-            argv = ["", "--config", "ged2dotrc"]
-            with unittest.mock.patch('sys.argv', argv):
-                ged2dot.main()
-            self.assertTrue(os.path.exists("hello.dot"))
-        finally:
-            os.chdir(pwd)
-
-    def test_no_images(self) -> None:
-        """Tests the happy path."""
+        expected = get_dot(ged2dot.GedcomImport().load(config), config)
+        self.assertEqual(ged2dot.render(config), expected)
+
+    def test_layout(self) -> None:
+        """Tests that a custom layout gets the DOT chunks."""
+        def mock_layout(chunks: Iterable[bytes], image_format: str) -> bytes:
+            self.assertEqual(image_format, "png")
+            return b"".join(chunks)
         config = {
             "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/happy.dot",
-            "rootfamily": "F1",
-        }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-        with open(config["output"], "r", encoding="utf-8") as stream:
-            self.assertNotIn("images/", stream.read())
-
-    def test_bom(self) -> None:
-        """Tests handling of an UTF-8 BOM."""
-        config = {
-            "familydepth": "4",
-            "input": "tests/bom.ged",
-            "output": "tests/bom.dot",
             "rootfamily": "F1",
-            "imagedir": "tests/images",
+            "format": "png",
+            "inline": "true",
         }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        # Without the accompanying fix in place, this test would have failed with:
-        # ValueError: invalid literal for int() with base 10: '\ufeff0'
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-
-    def test_family_depth(self) -> None:
-        """Tests handling of the familydepth parameter."""
-        config = {
-            "familydepth": "0",
-            "input": "tests/happy.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
-        assert root_family
-        subgraph = ged2dot.bfs(root_family, config)
-        # Just 3 nodes: wife, husband and the family node.
-        self.assertEqual(len(subgraph), 3)
+        self.assertTrue(ged2dot.render(config, mock_layout).startswith(b"// Generated by "))
 
-    def test_no_wife(self) -> None:
-        """Tests handling of no wife in a family."""
-        config = {
-            "familydepth": "0",
-            "input": "tests/no_wife.ged",
-            "output": "tests/no_wife.dot",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
-        assert root_family
-        neighbours = root_family.get_neighbours("both")
-        # Just 1 node: husband.
-        self.assertEqual(len(neighbours), 1)
-        self.assertEqual(neighbours[0].get_identifier(), "P2")
-
-        # Test export of a no-wife model.
-        subgraph = ged2dot.bfs(root_family, config)
-        exporter = ged2dot.DotExport()
-        exporter.store(subgraph, config)
-
-    def test_no_husband(self) -> None:
-        """Tests handling of no husband in a family."""
-        config = {
-            "familydepth": "0",
-            "input": "tests/no_husband.ged",
-            "output": "tests/no_husband.dot",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
-        assert root_family
-        neighbours = root_family.get_neighbours("both")
-        # Just 1 node: wife.
-        self.assertEqual(len(neighbours), 1)
-        self.assertEqual(neighbours[0].get_identifier(), "P1")
-
-        # Test export of a no-husband model.
-        subgraph = ged2dot.bfs(root_family, config)
-        exporter = ged2dot.DotExport()
-        exporter.store(subgraph, config)
-
-    def test_config_input_default(self) -> None:
-        """Tests config: input: default."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["input"], "-")
-        argv = [""]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-        # Now test reading from stdin.
-        argv = ["", "--output", "tests/output.dot"]
-        stdin = BufferHolder()
-        with open("tests/happy.ged", "rb") as stream:
-            stdin.buffer.write(stream.read())
-            stdin.buffer.seek(0)
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('sys.stdin', stdin):
-                ged2dot.main()
-
-    def test_config_input_custom(self) -> None:
-        """Tests config: input: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["input"], "test.ged")
-        argv = ["", "--input", "test.ged"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_output_default(self) -> None:
-        """Tests config: output: default."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["output"], "-")
-        argv = [""]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-        # Now test writing to stdout.
-        argv = ["", "--input", "tests/happy.ged"]
-        stdout = BufferHolder()
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('sys.stdout', stdout):
-                ged2dot.main()
-        stdout.buffer.seek(0)
-        actual = stdout.buffer.read()
-        self.assertTrue(actual.startswith(b"// Generated by "))
-
-    def test_config_output_custom(self) -> None:
-        """Tests config: output: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["output"], "test.ged")
-        argv = ["", "--output", "test.ged"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_rootfamily_default(self) -> None:
-        """Tests config: rootfamily: default."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["rootfamily"], "F1")
-        argv = [""]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_rootfamily_custom(self) -> None:
-        """Tests config: rootfamily: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["rootfamily"], "F42")
-        argv = ["", "--rootfamily", "F42"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_familydepth_default(self) -> None:
-        """Tests config: familydepth: default."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["familydepth"], "3")
-        argv = [""]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_familydepth_custom(self) -> None:
-        """Tests config: familydepth: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["familydepth"], "0")
-        argv = ["", "--familydepth", "0"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_imagedir_default(self) -> None:
-        """Tests config: imagedir: default."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["imagedir"], "images")
-        argv = [""]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_imagedir_custom(self) -> None:
-        """Tests config: imagedir: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["imagedir"], "myimagedir")
-        argv = ["", "--imagedir", "myimagedir"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_nameorder_default(self) -> None:
-        """Tests config: nameorder: default."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["nameorder"], "little")
-        argv = [""]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_config_birthformat_custom(self) -> None:
-        """Tests config: birthformat: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["birthformat"], "* {}")
-        argv = ["", "--birthformat", "* {}"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-
-class TestMain2(unittest.TestCase):
-    """Tests main(), second test set."""
-    def test_cousins_marrying(self) -> None:
-        """Tests cousins marrying."""
-        config = {
-            "familydepth": "4",
-            "input": "tests/cousins-marrying.ged",
-        }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
-        assert root_family
-        subgraph = ged2dot.bfs(root_family, config)
-        # 8 nodes:
-        # 1) A
-        # 2) B
-        # 3) family in which A and B are kids
-        # 4) A's family
-        # 5) B's family
-        # 6) A's kid: C
-        # 7) B's kid: D
-        # 8) C and D's family
-        self.assertEqual(len(subgraph), 8)
-
-    def test_multiline_note(self) -> None:
-        """Tests multiline notes."""
+    def test_convert_inline(self) -> None:
+        """Tests converting to an inline SVG, running dot."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "output": os.path.join(temp_dir, "out.svg"),
+                "format": "svg",
+                "inline": "true",
+            }
+            with unittest.mock.patch('ged2dot.find_dot', lambda: create_fake_dot(temp_dir)):
+                ged2dot.convert(config)
+                with open(config["output"], "rb") as stream:
+                    self.assertIn(b"data:image/jpeg;base64,", stream.read())
+
+                # Now test writing to stdout, without inlining.
+                config["output"] = "-"
+                config["inline"] = "false"
+                stdout = BufferHolder()
+                with unittest.mock.patch('sys.stdout', stdout):
+                    ged2dot.convert(config)
+                self.assertIn(b"xlink:href=\"tests/images", stdout.buffer.getvalue())
+
+    def test_dot_failure(self) -> None:
+        """Tests the error handling when dot fails or it's missing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "format": "svg",
+            }
+            with unittest.mock.patch('ged2dot.find_dot', lambda: create_fake_dot(temp_dir, exit_code=1)):
+                with self.assertRaises(ged2dot.Ged2DotException):
+                    ged2dot.render(config)
+            with unittest.mock.patch('ged2dot.find_dot', lambda: os.path.join(temp_dir, "nosuchdot")):
+                with self.assertRaises(ged2dot.Ged2DotException):
+                    ged2dot.render(config)
+
+    def test_cache(self) -> None:
+        """Tests that the layout is cached, but images are still inlined."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "format": "svg",
+                "inline": "true",
+                "cachedir": os.path.join(temp_dir, "cache"),
+            }
+            layouts = os.path.join(temp_dir, "layouts")
+            with unittest.mock.patch('ged2dot.find_dot', lambda: create_fake_dot(temp_dir)):
+                expected = ged2dot.render(config)
+                self.assertIn(b"data:image/jpeg;base64,", expected)
+                self.assertEqual(ged2dot.render(config), expected)
+                with open(layouts, "r", encoding="utf-8") as stream:
+                    self.assertEqual(stream.read(), "x")
+
+                # A different DOT or format is not a hit.
+                config["familydepth"] = "1"
+                ged2dot.render(config)
+                config["format"] = "png"
+                ged2dot.render(config)
+                with open(layouts, "r", encoding="utf-8") as stream:
+                    self.assertEqual(stream.read(), "xxx")
+
+            # dot failing to report its version is an error.
+            with unittest.mock.patch('ged2dot.find_dot', lambda: os.path.join(temp_dir, "nosuchdot")):
+                with self.assertRaises(ged2dot.Ged2DotException):
+                    ged2dot.render(config)
+
+    def test_cache_custom_layout(self) -> None:
+        """Tests that a custom layout is only cached if its version is known."""
+        layouts: List[str] = []
+
+        def mock_layout(chunks: Iterable[bytes], image_format: str) -> bytes:
+            layouts.append(image_format)
+            return b"".join(chunks)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "format": "png",
+                "cachedir": temp_dir,
+            }
+            ged2dot.render(config, mock_layout)
+            ged2dot.render(config, mock_layout)
+            self.assertEqual(len(layouts), 2)
+            ged2dot.render(config, mock_layout, "1.0")
+            ged2dot.render(config, mock_layout, "1.0")
+            self.assertEqual(len(layouts), 3)
+
+    def test_find_dot(self) -> None:
+        """Tests finding dot, including on Windows."""
+        self.assertEqual(ged2dot.find_dot(), "dot")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            environ = {"PROGRAMFILES": os.path.join(temp_dir, "a"), "PROGRAMFILES(x86)": os.path.join(temp_dir, "b")}
+            with unittest.mock.patch('sys.platform', "win32"):
+                with unittest.mock.patch.dict('os.environ', environ):
+                    with self.assertRaises(ged2dot.Ged2DotException):
+                        ged2dot.find_dot()
+                    dot_dir = os.path.join(temp_dir, "b", "Graphviz-12", "bin")
+                    os.makedirs(dot_dir)
+                    with open(os.path.join(dot_dir, "dot.exe"), "wb"):
+                        pass
+                    self.assertEqual(ged2dot.find_dot(), os.path.join(dot_dir, "dot.exe"))
+                with unittest.mock.patch.dict('os.environ', {}, clear=True):
+                    with self.assertRaises(ged2dot.Ged2DotException):
+                        ged2dot.find_dot()
+
+
+class TestServedInput(unittest.TestCase):
+    """Tests ServedInput."""
+    def test_happy(self) -> None:
+        """Tests that the families and the DOT come from the same parse, till the input changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ged = os.path.join(temp_dir, "happy.ged")
+            shutil.copy("tests/happy.ged", ged)
+            config = {"input": ged, "familydepth": "4", "imagedir": "images"}
+            served = ged2dot.ServedInput(config)
+            families = served.get_families()
+            self.assertEqual(len(families), 25)
+            family = families[0]
+            assert family.husb
+            self.assertEqual(family.husb.get_surname(), "Smith")
+
+            def mock_load(_self: ged2dot.GedcomImport, _config: Dict[str, str], lazy: bool = False) -> familytree.Graph:
+                raise AssertionError("unexpected load")
+            with unittest.mock.patch('ged2dot.GedcomImport.load', mock_load):
+                dot = served.get_dot(family.get_identifier(), config)
+                self.assertIsNotNone(dot)
+                self.assertIsNone(served.get_dot("I1", config))
+                self.assertEqual(b"".join(served.iter_dot(family.get_identifier(), config)), dot)
+                with self.assertRaises(ged2dot.Ged2DotException):
+                    next(served.iter_dot("I1", config))
+                # Closing the iterator early releases the graph.
+                chunks = served.iter_dot(family.get_identifier(), config)
+                next(chunks)
+                chunks.close()
+                self.assertFalse(served.lock.locked())
+
+            with open(ged, "rb") as reader:
+                data = reader.read()
+            with open(ged, "wb") as stream:
+                stream.write(data.replace(b"0 TRLR", b"0 @F100@ FAM\r\n0 TRLR"))
+            self.assertEqual(len(served.get_families()), 26)
+
+
+class TestServe(unittest.TestCase):
+    """Tests serve()."""
+    def setUp(self) -> None:
+        # Don't log requests to stderr.
+        patcher = unittest.mock.patch('sys.stderr', io.StringIO())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_server(self, config: Dict[str, str]) -> str:
+        """Starts a server in a thread, returns its URL."""
+        server = ged2dot.create_server(config)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(self, url: str) -> bytes:
+        """Gets the content of url."""
+        with urllib.request.urlopen(url) as response:
+            return cast(bytes, response.read())
+
+    def get_error(self, url: str) -> int:
+        """Gets the status code of a failing url."""
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.get(url)
+        context.exception.close()
+        return context.exception.code
+
+    def test_dot(self) -> None:
+        """Tests that the output is the same as the output of convert()."""
         config = {
+            "input": "tests/happy.ged",
+            "rootfamily": "F1",
             "familydepth": "4",
-            "input": "tests/multiline-note.ged",
+            "direction": "both",
+            "serve": "0",
         }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        person = ged2dot.graph_find(graph, "P2")
-        assert person
-        assert isinstance(person, ged2dot.Individual)
-        self.assertEqual(person.get_config().get_note(), "This is a note with\n3\nlines")
-
-    def test_no_cr(self) -> None:
-        """Tests the case when the file contains no \r."""
+        url = self.start_server(config)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for query, depth, direction in [("", "4", "both"), ("?root=F1&depth=1&direction=child", "1", "child")]:
+                convert_config = dict(config)
+                convert_config.update({"familydepth": depth, "direction": direction})
+                convert_config["output"] = os.path.join(temp_dir, "expected.dot")
+                ged2dot.convert(convert_config)
+                with open(convert_config["output"], "rb") as stream:
+                    self.assertEqual(self.get(url + "/dot" + query), stream.read())
+
+    def test_errors(self) -> None:
+        """Tests the handling of invalid requests."""
         config = {
-            "familydepth": "4",
-            "input": "tests/no-cr.ged",
-            "output": "tests/no-cr.dot",
+            "input": "tests/happy.ged, tests/bom.ged",
             "rootfamily": "F1",
+            "familydepth": "4",
+            "direction": "both",
+            "serve": "0",
         }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-
-    def test_relpath(self) -> None:
-        """Tests the happy path."""
+        url = self.start_server(config)
+        self.assertIn(b"digraph", self.get(url + "/dot?input=bom.ged"))
+        self.assertEqual(self.get_error(url + "/"), 404)
+        self.assertEqual(self.get_error(url + "/dot?input=nosuch.ged"), 404)
+        self.assertEqual(self.get_error(url + "/dot?root=F0"), 404)
+        self.assertEqual(self.get_error(url + "/dot?root=P1"), 404)
+        self.assertEqual(self.get_error(url + "/dot?depth=x"), 400)
+        self.assertEqual(self.get_error(url + "/dot?direction=x"), 400)
+        with unittest.mock.patch('ged2dot.find_dot', lambda: "tests/nosuchdot"):
+            self.assertEqual(self.get_error(url + "/svg"), 500)
+
+        # Inputs with the same file name can't be told apart.
+        config["input"] = "tests/happy.ged,tests/hello.ged,tests/config/hello.ged"
+
+        def mock_load(_self: ged2dot.ServedInput) -> None:
+            raise AssertionError("unexpected load")
+        with unittest.mock.patch('ged2dot.ServedInput.load', mock_load):
+            with self.assertRaises(ged2dot.Ged2DotException):
+                ged2dot.create_server(config)
+
+    def test_svg(self) -> None:
+        """Tests SVG output, with inlined images."""
         config = {
-            "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/happy.dot",
             "rootfamily": "F1",
-            "imagedir": os.path.join(os.getcwd(), "tests/images"),
-            "relpath": "true",
-        }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-        with open(config["output"], "r", encoding="utf-8") as stream:
-            self.assertNotIn('src="/', stream.read())
-
-    def test_config_relpath_custom(self) -> None:
-        """Tests config: relpath: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["relpath"], "true")
-        argv = ["", "--relpath"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_death_date(self) -> None:
-        """Tests the case when no birth date is provided."""
-        config = {
             "familydepth": "4",
-            "input": "tests/death_date.ged",
-            "output": "tests/death_date.dot",
-            "rootfamily": "F1",
-        }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        ged2dot.convert(config)
-        self.assertTrue(os.path.exists(config["output"]))
-        with open(config["output"], "r", encoding="utf-8") as stream:
-            self.assertIn("† Y", stream.read())
-
-    def test_config_nameorder_custom(self) -> None:
-        """Tests config: nameorder: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["nameorder"], "big")
-        argv = ["", "--nameorder", "big"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_fam_marr(self) -> None:
-        """Tests handling of marriage date in a family."""
-        config = {
-            "familydepth": "0",
-            "input": "tests/fam_marr.ged",
-            "output": "tests/fam_marr.dot",
+            "direction": "both",
+            "inline": "true",
+            "serve": "0",
         }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        root_family = ged2dot.graph_find(graph, "F1")
-        assert root_family
-        assert isinstance(root_family, ged2dot.Family)
-        # Check the found date, both the husb and the wife has a bogus date, which should be
-        # ignored.
-        self.assertEqual(root_family.get_marr(), "1970")
-
-        # Test export of a fam-marr model.
-        subgraph = ged2dot.bfs(root_family, config)
-        exporter = ged2dot.DotExport()
-        exporter.store(subgraph, config)
-
-    def test_fam_no_marr(self) -> None:
-        """Tests handling of marriage node when it has no date."""
-        # Given a family with no marriage date:
+        url = self.start_server(config)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with unittest.mock.patch('ged2dot.find_dot', lambda: create_fake_dot(temp_dir)):
+                with urllib.request.urlopen(url + "/svg") as response:
+                    self.assertEqual(response.headers["Content-Type"], "image/svg+xml")
+                    self.assertIn(b"data:image/jpeg;base64,", response.read())
+
+    def test_reload(self) -> None:
+        """Tests that a changed input is parsed again."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "happy.ged")
+            shutil.copyfile("tests/happy.ged", path)
+            config = {
+                "input": path,
+                "rootfamily": "F1",
+                "familydepth": "0",
+                "direction": "both",
+                "serve": "0",
+            }
+            url = self.start_server(config)
+            self.assertNotIn(b"Reloaded", self.get(url + "/dot"))
+            with open(path, "rb") as stream:
+                gedcom = stream.read()
+            with open(path, "wb") as stream:
+                stream.write(gedcom.replace(b"/Smith/", b"/Reloaded/"))
+            # The old and new modification time may be the same.
+            os.utime(path, ns=(0, 0))
+            self.assertIn(b"Reloaded", self.get(url + "/dot"))
+
+    def test_serve(self) -> None:
+        """Tests that serve() stops on Ctrl-C."""
         config = {
-            "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/happy.dot",
-            "rootfamily": "F1",
-            "imagedir": os.path.join(os.getcwd(), "tests/images"),
-            "relpath": "true",
+            "serve": "0",
         }
+        with unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with unittest.mock.patch('ged2dot.Ged2DotServer.serve_forever', side_effect=KeyboardInterrupt):
+                ged2dot.serve(config)
+        self.assertIn("Serving on http://127.0.0.1:", stderr.getvalue())
+
 
-        # When converting from ged to dot:
-        ged2dot.convert(config)
-
-        # Then make sure that explicit width and height is specified for the table around the image,
-        # required by the PNG output:
-        with open(config["output"], "r", encoding="utf-8") as dot_stream:
-            graph = pygraphviz.AGraph(string=dot_stream.read())
-        family = graph.get_node("F1")
-        stream = io.StringIO(family.attr.get("label"))
-        tree = ET.parse(stream)
-        root = tree.getroot()
-        self.assertIn("width", root.attrib)
-        self.assertIn("height", root.attrib)
-
-    def test_bad_rootfamily(self) -> None:
-        """Tests the happy path."""
+class TestDotExport(unittest.TestCase):
+    """Tests DotExport."""
+    def test_chunks(self) -> None:
+        """Tests that writing in small chunks gives the same output."""
         config = {
             "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/happy.dot",
-            "rootfamily": "42",
-            "imagedir": "images",
-        }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        with self.assertRaises(Exception):
-            ged2dot.convert(config)
-
-    def test_bad_rootfamily_empty_graph(self) -> None:
-        """Tests the happy path."""
-        config = {
-            "familydepth": "4",
-            "input": "tests/empty.ged",
-            "output": "tests/empty.dot",
-            "rootfamily": "42",
-            "imagedir": "images",
+            "rootfamily": "F1",
+            "output": "-",
         }
-        if os.path.exists(config["output"]):
-            os.unlink(config["output"])
-        self.assertFalse(os.path.exists(config["output"]))
-        with self.assertRaises(Exception):
-            ged2dot.convert(config)
-
-    def test_config_direction_custom(self) -> None:
-        """Tests config: direction: custom."""
-        def mock_convert(config: Dict[str, str]) -> None:
-            self.assertEqual(config["direction"], "child")
-        argv = ["", "--direction", "child"]
-        with unittest.mock.patch('sys.argv', argv):
-            with unittest.mock.patch('ged2dot.convert', mock_convert):
-                ged2dot.main()
-
-    def test_direction_child(self) -> None:
-        """Tests the direction=child case."""
+        graph = ged2dot.GedcomImport().load(config)
+        expected = get_dot(graph, config)
+        with unittest.mock.patch('ged2dot.DotExport.chunk_size', 2):
+            self.assertEqual(get_dot(graph, config), expected)
+
+    def test_iter_dot(self) -> None:
+        """Tests that the output is produced in chunks."""
         config = {
             "familydepth": "4",
             "input": "tests/happy.ged",
-            "output": "tests/happy.dot",
-            "direction": "child",
+            "rootfamily": "F1",
+            "output": "-",
         }
-        importer = ged2dot.GedcomImport()
-        graph = importer.load(config)
-        indi = ged2dot.graph_find(graph, "P157")
-        assert indi
-        neighbours = indi.get_neighbours("both")
-        # parent: F152 + child: F25
-        self.assertEqual(len(neighbours), 2)
-        neighbours = indi.get_neighbours("child")
-        # child: F25
-        self.assertEqual(len(neighbours), 1)
-
-
-class TestGetAbspath(unittest.TestCase):
-    """Tests get_abspath()."""
-    def test_happy(self) -> None:
-        """Tests the happy path."""
-        self.assertEqual(ged2dot.get_abspath("foo"), os.path.join(os.getcwd(), "foo"))
-
-    def test_abs(self) -> None:
-        """Tests the case when the input is abs already."""
-        abspath = os.path.join(os.getcwd(), "foo")
-        self.assertEqual(ged2dot.get_abspath(abspath), abspath)
+        subgraph = ged2dot.get_subgraph(config)
+        with unittest.mock.patch('ged2dot.DotExport.chunk_size', 10):
+            chunks = list(ged2dot.DotExport().iter_dot(subgraph, config))
+        self.assertGreater(len(chunks), 2)
+        stream = io.BytesIO()
+        ged2dot.DotExport().store_to_stream(subgraph, stream, config)
+        self.assertEqual(b"".join(chunks), stream.getvalue())
 
 
 class TestFuzz(unittest.TestCase):
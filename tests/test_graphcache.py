@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""The test_graphcache module covers the graphcache module."""
+
+from typing import Dict
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import familytree
+import ged2dot
+import graphcache
+
+
+def get_dot(graph: familytree.Graph, config: Dict[str, str]) -> bytes:
+    """Exports the subgraph around the root family of config to a DOT string."""
+    root_family = graph.find(config["rootfamily"])
+    assert root_family
+    subgraph = familytree.bfs(root_family, config)
+    stream = io.BytesIO()
+    ged2dot.DotExport().store_to_stream(subgraph, stream, config)
+    return stream.getvalue()
+
+
+class TestGraphCache(unittest.TestCase):
+    """Tests GraphCache."""
+    def test_happy(self) -> None:
+        """Tests that the second load is from the cache, with the same output."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "cachedir": cache_dir,
+            }
+            graph = ged2dot.GedcomImport().load(config)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            expected = get_dot(graph, config)
+
+            def mock_tokenize(_self: ged2dot.GedcomImport, _config: Dict[str, str]) -> familytree.Graph:
+                raise AssertionError("unexpected tokenize")
+            with unittest.mock.patch('ged2dot.GedcomImport.tokenize', mock_tokenize):
+                graph = ged2dot.GedcomImport().load(config)
+                self.assertNotIsInstance(graph, familytree.CsrGraph)
+                self.assertEqual(get_dot(graph, config), expected)
+                config["backend"] = "csr"
+                graph = ged2dot.GedcomImport().load(config)
+                self.assertIsInstance(graph, familytree.CsrGraph)
+                self.assertEqual(get_dot(graph, config), expected)
+
+    def test_invalidate(self) -> None:
+        """Tests that the cache is not used after the input changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ged_path = os.path.join(temp_dir, "hello.ged")
+            shutil.copyfile("tests/hello.ged", ged_path)
+            config = {
+                "input": ged_path,
+                # Relative to the input.
+                "cachedir": ".",
+                "backend": "csr",
+            }
+            individual = ged2dot.GedcomImport().load(config).find("P1")
+            assert isinstance(individual, familytree.Individual)
+            self.assertEqual(individual.get_surname(), "A")
+            self.assertEqual(len(os.listdir(temp_dir)), 2)
+
+            with open(ged_path, "rb") as stream:
+                buf = stream.read()
+            with open(ged_path, "wb") as stream:
+                stream.write(buf.replace(b"/A/", b"/Changed/"))
+            individual = ged2dot.GedcomImport().load(config).find("P1")
+            assert isinstance(individual, familytree.Individual)
+            self.assertEqual(individual.get_surname(), "Changed")
+
+    def test_corrupt(self) -> None:
+        """Tests that a corrupt cache file is ignored."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = {
+                "input": "tests/hello.ged",
+                "cachedir": cache_dir,
+            }
+            cache = graphcache.GraphCache(config)
+            with open(cache.path, "wb") as stream:
+                stream.write(b"garbage")
+            self.assertIsNone(cache.load())
+            graph = ged2dot.GedcomImport().load(config)
+            self.assertEqual(len(graph), 3)
+            self.assertIsNotNone(cache.load())
+
+    def test_unwritable(self) -> None:
+        """Tests that a cache directory which can't be created just disables the cache."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, "file"), "wb"):
+                pass
+            config = {
+                "input": "tests/hello.ged",
+                "cachedir": os.path.join(temp_dir, "file", "cache"),
+            }
+            graph = ged2dot.GedcomImport().load(config)
+            self.assertEqual(len(graph), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""The test_imagecache module covers the imagecache module."""
+
+from typing import List
+import marshal
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from PIL import Image
+
+import ged2dot
+import imagecache
+
+
+class TestImageIndex(unittest.TestCase):
+    """Tests ImageIndex."""
+    def test_happy(self) -> None:
+        """Tests that the listing is cached till the directory changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_dir = os.path.join(temp_dir, "images")
+            cache_dir = os.path.join(temp_dir, "cache")
+            os.mkdir(image_dir)
+            with open(os.path.join(image_dir, "Alice Smith.jpg"), "wb"):
+                pass
+            image_index = imagecache.ImageIndex(image_dir)
+            image_index.scan(cache_dir)
+            self.assertTrue(image_index.contains("Alice Smith.jpg"))
+            self.assertFalse(image_index.contains("Bob Smith.jpg"))
+
+            def mock_listdir(_path: str) -> List[str]:
+                raise AssertionError("unexpected listdir")
+            with unittest.mock.patch('os.listdir', mock_listdir):
+                image_index = imagecache.ImageIndex(image_dir)
+                image_index.scan(cache_dir)
+                self.assertTrue(image_index.contains("Alice Smith.jpg"))
+
+            with open(os.path.join(image_dir, "Bob Smith.jpg"), "wb"):
+                pass
+            # Make sure the directory's modification time changes, even with a coarse timestamp.
+            mtime = os.stat(image_dir).st_mtime_ns + 1000000000
+            os.utime(image_dir, ns=(mtime, mtime))
+            image_index = imagecache.ImageIndex(image_dir)
+            image_index.scan(cache_dir)
+            self.assertTrue(image_index.contains("Bob Smith.jpg"))
+
+            # A corrupted cache is ignored.
+            cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_file, "wb") as stream:
+                stream.write(b"garbage")
+            image_index = imagecache.ImageIndex(image_dir)
+            image_index.scan(cache_dir)
+            self.assertTrue(image_index.contains("Bob Smith.jpg"))
+
+    def test_normalize(self) -> None:
+        """Tests that a decomposed file name matches a composed name from the gedcom."""
+        with tempfile.TemporaryDirectory() as image_dir:
+            with open(os.path.join(image_dir, "Ale\u0301xis Smith.jpg"), "wb"):
+                pass
+            image_index = imagecache.ImageIndex(image_dir)
+            image_index.scan()
+            self.assertTrue(image_index.contains("Al\u00e9xis Smith.jpg"))
+            # The link is to the actual file, not to the name from the gedcom.
+            self.assertTrue(os.path.exists(image_index.get_path("Al\u00e9xis Smith.jpg")))
+
+    def test_missing(self) -> None:
+        """Tests that a missing image directory has no images."""
+        image_index = imagecache.ImageIndex("tests/nosuchdir")
+        image_index.scan()
+        self.assertEqual(image_index.names, {})
+        self.assertFalse(image_index.contains("Alice Smith.jpg"))
+
+    def test_unlistable(self) -> None:
+        """Tests that names are probed on the file system when the directory can't be listed."""
+        def mock_listdir(_path: str) -> List[str]:
+            raise PermissionError()
+        with unittest.mock.patch('os.listdir', mock_listdir):
+            image_index = imagecache.ImageIndex("tests/images")
+            image_index.scan()
+        self.assertIsNone(image_index.names)
+        self.assertTrue(image_index.contains("Richard Smith Y.jpg"))
+        self.assertEqual(image_index.get_path("Richard Smith Y.jpg"), "tests/images/Richard Smith Y.jpg")
+
+
+class TestThumbnailCache(unittest.TestCase):
+    """Tests ThumbnailCache."""
+    def test_happy(self) -> None:
+        """Tests that thumbnails are created once, and again when the original changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            photo = os.path.join(temp_dir, "photo.jpg")
+            Image.new("RGB", (400, 200)).save(photo)
+            cache = imagecache.ThumbnailCache(os.path.join(temp_dir, "cache"), 100)
+            path = cache.get_path(photo)
+            self.assertNotEqual(path, photo)
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (100, 50))
+                self.assertEqual(image.format, "JPEG")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(cache.get_path(photo), path)
+            self.assertEqual(os.stat(path).st_mtime_ns, 0)
+
+            Image.new("RGB", (50, 50)).save(photo)
+            os.utime(photo, ns=(0, 0))
+            path = cache.get_path(photo)
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (50, 50))
+
+            # Not an image: the original is used.
+            text = os.path.join(temp_dir, "text.jpg")
+            with open(text, "wb") as stream:
+                stream.write(b"x")
+            self.assertEqual(cache.get_path(text), text)
+
+    def test_exif(self) -> None:
+        """Tests that the orientation of photos is respected."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            photo = os.path.join(temp_dir, "photo.jpg")
+            exif = Image.Exif()
+            # Orientation: rotate 90 degrees clockwise.
+            exif[0x0112] = 6
+            Image.new("RGB", (400, 200)).save(photo, exif=exif)
+            with Image.open(imagecache.ThumbnailCache(temp_dir, 100).get_path(photo)) as image:
+                self.assertEqual(image.size, (50, 100))
+
+    def test_convert(self) -> None:
+        """Tests that the thumbnails are linked from the DOT output."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "imagedir": os.path.abspath("tests/images"),
+                "output": os.path.join(temp_dir, "output.dot"),
+                "thumbnailsize": "50",
+            }
+            with self.assertRaises(ged2dot.Ged2DotException):
+                ged2dot.convert(config)
+            config["cachedir"] = temp_dir
+            with unittest.mock.patch('importlib.util.find_spec', lambda _name: None):
+                with self.assertRaises(ged2dot.Ged2DotException):
+                    ged2dot.convert(config)
+            ged2dot.convert(config)
+            with open(config["output"], "r", encoding="utf-8") as stream:
+                dot = stream.read()
+            self.assertEqual(dot.count(os.path.join(temp_dir, "ged2dot-thumbnail-")), 5)
+            self.assertNotIn("tests/images", dot)
+
+
+class TestImageSizeCache(unittest.TestCase):
+    """Tests ImageSizeCache."""
+    def test_get_image_size(self) -> None:
+        """Tests that the sizes of the supported formats match dot's."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "image")
+            for image_format in ("PNG", "GIF", "JPEG"):
+                Image.new("RGB", (333, 211)).save(path, format=image_format)
+                self.assertEqual(imagecache.get_image_size(path), (249, 158))
+            # JPEG with an EXIF segment before the frame, a fill byte and a marker without a length.
+            exif = Image.Exif()
+            exif[0x010e] = "x" * 1000
+            Image.new("RGB", (40, 20)).save(path, format="JPEG", exif=exif)
+            with open(path, "rb") as stream:
+                data = stream.read()
+            with open(path, "wb") as stream:
+                stream.write(data[:2] + b"\xff\xff\xd0" + data[2:])
+            self.assertEqual(imagecache.get_image_size(path), (30, 15))
+            # Truncated or corrupted JPEG.
+            for data in (b"\xff\xd8\x00", b"\xff\xd8\xff", b"\xff\xd8\xff\xc0\x00\x11\x08", b"\xff\xd8\xff\xe0\x00"):
+                with open(path, "wb") as stream:
+                    stream.write(data)
+                self.assertIsNone(imagecache.get_image_size(path))
+            svgs = [
+                ('width="100px" height="50px"', (56, 28)),
+                ('width="100" height="50pt"', (75, 37)),
+                ('width="2in" height="1cm"', (108, 21)),
+                ('width="100%" height="100%"', None),
+                ('viewBox="0 0 100 50"', None),
+                ('width="1.2.3" height="1"', None),
+            ]
+            for attributes, size in svgs:
+                with open(path, "w", encoding="utf-8") as stream:
+                    stream.write(f'<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg" {attributes}/>')
+                self.assertEqual(imagecache.get_image_size(path), size)
+            with open(path, "wb") as stream:
+                stream.write(b"x")
+            self.assertIsNone(imagecache.get_image_size(path))
+
+    def test_happy(self) -> None:
+        """Tests that sizes are cached till the image changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            photo = os.path.join(temp_dir, "photo.png")
+            Image.new("RGB", (400, 200)).save(photo)
+            cache_dir = os.path.join(temp_dir, "cache")
+            cache = imagecache.ImageSizeCache(cache_dir)
+            self.assertEqual(cache.get_size(photo), (300, 150))
+            self.assertIsNone(cache.get_size(os.path.join(temp_dir, "nosuch.png")))
+
+            # A path is only stat'ed once during an export.
+            def mock_stat(_path: str) -> None:
+                raise AssertionError("unexpected stat")
+            with unittest.mock.patch('os.stat', mock_stat):
+                self.assertEqual(cache.get_size(photo), (300, 150))
+                self.assertIsNone(cache.get_size(os.path.join(temp_dir, "nosuch.png")))
+            cache.save()
+            # Nothing new to save.
+            cache.save()
+
+            def mock_get_image_size(_path: str) -> None:
+                raise AssertionError("unexpected get_image_size")
+            with unittest.mock.patch('imagecache.get_image_size', mock_get_image_size):
+                self.assertEqual(imagecache.ImageSizeCache(cache_dir).get_size(photo), (300, 150))
+
+            Image.new("RGB", (40, 40)).save(photo)
+            os.utime(photo, ns=(0, 0))
+            cache = imagecache.ImageSizeCache(cache_dir)
+            self.assertEqual(cache.get_size(photo), (30, 30))
+
+            # An unknown size is cached, too.
+            text = os.path.join(temp_dir, "text.png")
+            with open(text, "wb") as stream:
+                stream.write(b"x")
+            self.assertIsNone(cache.get_size(text))
+            self.assertEqual(cache.sizes[text][2:], (0, 0))
+
+            # A corrupted cache or one from an other version is ignored.
+            with open(cache.cache_path, "wb") as stream:
+                stream.write(b"garbage")
+            self.assertEqual(imagecache.ImageSizeCache(cache_dir).get_size(photo), (30, 30))
+            with open(cache.cache_path, "wb") as stream:
+                stream.write(marshal.dumps((0, {photo: (0, 0, 1, 1)})))
+            self.assertEqual(imagecache.ImageSizeCache(cache_dir).get_size(photo), (30, 30))
+
+            # The cache directory can't be created: the sizes are not stored.
+            with open(os.path.join(temp_dir, "file"), "wb"):
+                pass
+            cache = imagecache.ImageSizeCache(os.path.join(temp_dir, "file", "cache"))
+            self.assertEqual(cache.get_size(photo), (30, 30))
+            cache.save()
+            self.assertTrue(cache.modified)
+
+    def test_convert(self) -> None:
+        """Tests that the DOT output states the size of images, and the sizes are stored."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = {
+                "familydepth": "4",
+                "input": "tests/happy.ged",
+                "rootfamily": "F1",
+                "imagedir": os.path.abspath("tests/images"),
+                "output": os.path.join(temp_dir, "output.dot"),
+                "cachedir": temp_dir,
+            }
+            # Sizes are not stated by default.
+            ged2dot.convert(config)
+            with open(config["output"], "r", encoding="utf-8") as stream:
+                self.assertNotIn("fixedsize", stream.read())
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, "ged2dot-image-sizes.cache")))
+
+            config["imagesizes"] = "true"
+            ged2dot.convert(config)
+            with open(config["output"], "r", encoding="utf-8") as stream:
+                dot = stream.read()
+            # 75x75 photos and 56x56 placeholders, with the padding of the cell.
+            self.assertEqual(dot.count('<td fixedsize="true" width="79" height="79">'), 5)
+            self.assertEqual(dot.count('<td fixedsize="true" width="60" height="60">'), 52)
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, "ged2dot-image-sizes.cache")))
+
+            # An image with an unknown size is left to dot.
+            image_dir = os.path.join(temp_dir, "images")
+            os.mkdir(image_dir)
+            with open(os.path.join(image_dir, "Richard Smith Y.jpg"), "wb") as stream:
+                stream.write(b"x")
+            config["imagedir"] = image_dir
+            ged2dot.convert(config)
+            with open(config["output"], "r", encoding="utf-8") as stream:
+                self.assertIn('<tr><td><img scale="true" src="' + image_dir, stream.read())
+
+            # Without a cachedir, the sizes are still stated, just not stored.
+            config["imagedir"] = os.path.abspath("tests/images")
+            config["cachedir"] = ""
+            os.remove(os.path.join(temp_dir, "ged2dot-image-sizes.cache"))
+            ged2dot.convert(config)
+            with open(config["output"], "r", encoding="utf-8") as stream:
+                self.assertEqual(stream.read().count('<td fixedsize="true" width="79" height="79">'), 5)
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, "ged2dot-image-sizes.cache")))
+
+
+if __name__ == '__main__':
+    unittest.main()
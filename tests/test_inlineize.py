@@ -6,8 +6,12 @@
 
 """The test_inlineize module covers the inlineize module."""
 
+from typing import List
+from typing import Tuple
+import io
 import unittest
 import unittest.mock
+from xml.etree import ElementTree
 
 import inlineize
 
@@ -26,7 +30,129 @@ class TestMain(unittest.TestCase):
         with open("tests/inline.svg", "r", encoding="utf-8") as stream:
             buffer = stream.read()
             self.assertNotIn("xlink:href\"tests/images", buffer)
-            self.assertIn("xlink:href=\"data:image/png;base64,", buffer)
+            self.assertIn("xlink:href=\"data:image/jpeg;base64,", buffer)
+
+
+class TestInlineize(unittest.TestCase):
+    """Tests inlineize()."""
+    def test_shared(self) -> None:
+        """Tests that images with multiple uses are only embedded once."""
+        output = io.BytesIO()
+        inlineize.inlineize("tests/linked.svg", output)
+        output.seek(0)
+        root = ElementTree.parse(output).getroot()
+        svg_ns = "{" + inlineize.SVG_NS + "}"
+        xlinkhref = "{" + inlineize.XLINK_NS + "}href"
+        # 2 placeholders, 2 placeholders with an unusual size and 5 photos.
+        shared = root.findall(f".//{svg_ns}defs/{svg_ns}image")
+        self.assertEqual(len(shared), 9)
+        self.assertEqual(len(root.findall(f".//{svg_ns}image")), 9)
+        self.assertTrue(shared[0].attrib[xlinkhref].startswith("data:image/svg+xml;base64,"))
+        photos = [i for i in shared if i.attrib[xlinkhref].startswith("data:image/jpeg;base64,")]
+        self.assertEqual(len(photos), 5)
+        self.assertNotIn("x", shared[0].attrib)
+        uses = root.findall(f".//{svg_ns}use")
+        self.assertEqual(len(uses), 57)
+        self.assertEqual(uses[0].attrib[xlinkhref], "#" + shared[0].attrib["id"])
+        self.assertIn("x", uses[0].attrib)
+
+    def test_no_position(self) -> None:
+        """Tests images without a position."""
+        svg = f"""<svg xmlns="{inlineize.SVG_NS}" xmlns:xlink="{inlineize.XLINK_NS}">
+<image xlink:href="placeholder-f.svg" width="75px"/>
+<image xlink:href="placeholder-f.svg" width="75px"/>
+<image xlink:href="placeholder-f.svg" width="50px"/>
+</svg>"""
+        output = io.BytesIO()
+        reads: List[str] = []
+
+        def mock_read_data_uri(path: str) -> Tuple[str, float]:
+            reads.append(path)
+            return real_read_data_uri(path)
+        real_read_data_uri = inlineize.read_data_uri
+        # Also wait for the images before the end of the input.
+        with unittest.mock.patch.object(inlineize.Inliner, "max_pending", 1):
+            with unittest.mock.patch('inlineize.read_data_uri', mock_read_data_uri):
+                timings = inlineize.inlineize(io.BytesIO(svg.encode("utf-8")), output)
+        # The 2 sizes need 2 images, but the file is read and encoded once.
+        self.assertEqual(reads, ["placeholder-f.svg"])
+        self.assertEqual(output.getvalue().count(b"data:image/svg+xml;base64,"), 2)
+        self.assertEqual(sorted(timings.keys()), ["parse", "read", "total", "wait", "write"])
+        self.assertGreater(timings["read"], 0)
+        self.assertEqual(output.getvalue().count(b'<use xlink:href="#inline-image-0"/>'), 2)
+
+    def test_data_uri_eviction(self) -> None:
+        """Tests that only the data of recently used images is kept."""
+        svg = f"""<svg xmlns="{inlineize.SVG_NS}" xmlns:xlink="{inlineize.XLINK_NS}">
+<image xlink:href="placeholder-f.svg" width="75px"/>
+<image xlink:href="placeholder-m.svg" width="75px"/>
+<image xlink:href="placeholder-f.svg" width="75px"/>
+<image xlink:href="placeholder-m.svg" width="50px"/>
+<image xlink:href="placeholder-f.svg" width="50px"/>
+</svg>"""
+        reads: List[str] = []
+
+        def mock_read_data_uri(path: str) -> Tuple[str, float]:
+            reads.append(path)
+            return real_read_data_uri(path)
+        real_read_data_uri = inlineize.read_data_uri
+        with unittest.mock.patch.object(inlineize.Inliner, "max_data_uris", 1):
+            with unittest.mock.patch('inlineize.read_data_uri', mock_read_data_uri):
+                inlineize.inlineize(io.BytesIO(svg.encode("utf-8")), io.BytesIO())
+        # Only the data of placeholder-m.svg is kept, so placeholder-f.svg is read again.
+        self.assertEqual(reads, ["placeholder-f.svg", "placeholder-m.svg", "placeholder-f.svg"])
+
+    def test_markup(self) -> None:
+        """Tests that markup other than linked images is kept."""
+        svg = f"""<?xml version="1.0" encoding="ISO-8859-1"?>
+<!DOCTYPE svg SYSTEM "svg.dtd">
+<!-- comment -->
+<?pi data?>
+<s:svg xmlns:s="{inlineize.SVG_NS}" xmlns:xlink="{inlineize.XLINK_NS}">
+<s:title>a &amp; b &lt; c á</s:title>
+<s:g title="&quot;x&quot;&#10;&amp;&lt;&gt;&#13;&#9;"><s:image/><s:image xlink:href="data:image/png;base64,"/></s:g>
+<s:image id="i" xlink:href="placeholder-f.svg"><s:title>t</s:title></s:image>
+</s:svg>"""
+        output = io.BytesIO()
+        # Also parse and write in multiple chunks.
+        with unittest.mock.patch.object(inlineize.Inliner, "chunk_size", 16):
+            inlineize.inlineize(io.BytesIO(svg.encode("iso-8859-1")), output)
+        expected = f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE svg SYSTEM "svg.dtd">
+<!-- comment -->
+<?pi data?><s:svg xmlns:s="{inlineize.SVG_NS}" xmlns:xlink="{inlineize.XLINK_NS}">
+<s:title>a &amp; b &lt; c á</s:title>
+<s:g title="&quot;x&quot;&#10;&amp;&lt;&gt;&#13;&#9;"><s:image/><s:image xlink:href="data:image/png;base64,"/></s:g>
+<s:defs><s:image id="inline-image-0" xlink:href="data:image/svg+xml;base64,"""
+        self.assertTrue(output.getvalue().decode("utf-8").startswith(expected))
+        self.assertIn(b'"/></s:defs><s:use id="i" xlink:href="#inline-image-0"><s:title>t</s:title></s:use>',
+                      output.getvalue())
+
+    def test_doctype(self) -> None:
+        """Tests doctypes without a public ID."""
+        for doctype in ["<!DOCTYPE svg>", '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "svg.dtd">']:
+            output = io.BytesIO()
+            inlineize.inlineize(io.BytesIO(doctype.encode("utf-8") + b"<svg/>"), output)
+            self.assertEqual(output.getvalue(), doctype.encode("utf-8") + b"\n<svg/>")
+
+
+class TestGetMimeType(unittest.TestCase):
+    """Tests get_mime_type()."""
+    def test_happy(self) -> None:
+        """Tests that the content decides, then the extension."""
+        headers = [
+            (b"\x89PNG\r\n\x1a\n", "image/png"),
+            (b"\xff\xd8\xff\xe0", "image/jpeg"),
+            (b"GIF87a", "image/gif"),
+            (b"GIF89a", "image/gif"),
+            (b"RIFF\0\0\0\0WEBPVP8", "image/webp"),
+            (b"RIFF\0\0\0\0WAVE", "application/octet-stream"),
+            (b'<?xml version="1.0"?>\n<svg', "image/svg+xml"),
+            (b"", "application/octet-stream"),
+        ]
+        for header, mime_type in headers:
+            self.assertEqual(inlineize.get_mime_type(header, "image.jpg.unknown"), mime_type)
+        self.assertEqual(inlineize.get_mime_type(b"", "image.jpg"), "image/jpeg")
 
 
 if __name__ == '__main__':
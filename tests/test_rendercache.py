@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""The test_rendercache module covers the rendercache module."""
+
+from typing import Iterable
+from typing import List
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import rendercache
+
+
+class TestRenderCache(unittest.TestCase):
+    """Tests RenderCache."""
+    def test_eviction(self) -> None:
+        """Tests that the least recently used outputs are removed."""
+        def mock_layout(chunks: Iterable[bytes], _image_format: str) -> bytes:
+            return b"".join(chunks) * 5
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = rendercache.RenderCache(temp_dir, max_size=20, version="1.0", layout=mock_layout)
+            cache.layout([b"a"], "svg")
+            cache.layout([b"b"], "svg")
+            paths = {}
+            for name in os.listdir(temp_dir):
+                with open(os.path.join(temp_dir, name), "rb") as stream:
+                    paths[stream.read()] = os.path.join(temp_dir, name)
+            os.utime(paths[b"aaaaa"], ns=(1000000000, 1000000000))
+            os.utime(paths[b"bbbbb"], ns=(2000000000, 2000000000))
+            # A hit makes "a" the most recently used one.
+            self.assertEqual(cache.layout([b"a"], "svg"), b"aaaaa")
+            with open(os.path.join(temp_dir, "unrelated"), "wb") as unrelated:
+                unrelated.write(b"x" * 100)
+            cache.layout([b"c"] * 3, "svg")
+            self.assertTrue(os.path.exists(paths[b"aaaaa"]))
+            self.assertFalse(os.path.exists(paths[b"bbbbb"]))
+            self.assertEqual(len(os.listdir(temp_dir)), 3)
+            # An output larger than the whole cache is not kept.
+            self.assertEqual(cache.layout([b"d"] * 5, "svg"), b"d" * 25)
+            self.assertEqual(os.listdir(temp_dir), ["unrelated"])
+
+        # Can't write the cache: just no caching.
+        cache = rendercache.RenderCache("tests/happy.ged", max_size=20, version="1.0", layout=mock_layout)
+        self.assertEqual(cache.layout([b"a"], "svg"), b"aaaaa")
+
+    def test_images(self) -> None:
+        """Tests that replacing an image invalidates the outputs which refer to it."""
+        layouts: List[bytes] = []
+
+        def mock_layout(chunks: Iterable[bytes], _image_format: str) -> bytes:
+            layouts.append(b"".join(chunks))
+            return b"output"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image = os.path.join(temp_dir, "photo.png")
+            with open(image, "wb") as stream:
+                stream.write(b"x")
+            cache_dir = os.path.join(temp_dir, "cache")
+            cache = rendercache.RenderCache(cache_dir, max_size=1024, version="1.0", layout=mock_layout)
+            dot = [b'P1 [label = <<table><tr><td><img scale="true" src="' + image.encode("utf-8") + b'"/></td></tr>',
+                   b'<tr><td><img src="nosuch.png"/></td></tr></table>>];']
+            cache.layout(dot, "png")
+            cache.layout(dot, "png")
+            self.assertEqual(len(layouts), 1)
+            with open(image, "wb") as stream:
+                stream.write(b"xy")
+            cache.layout(dot, "png")
+            self.assertEqual(len(layouts), 2)
+            os.utime(image, ns=(0, 0))
+            cache.layout(dot, "png")
+            self.assertEqual(len(layouts), 3)
+
+    def test_read_only(self) -> None:
+        """Tests that a cache file which can be read but not written is still a hit."""
+        layouts: List[bytes] = []
+
+        def mock_layout(chunks: Iterable[bytes], _image_format: str) -> bytes:
+            layouts.append(b"".join(chunks))
+            return b"output"
+
+        def mock_utime(_path: str) -> None:
+            raise PermissionError()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = rendercache.RenderCache(temp_dir, max_size=1024, version="1.0", layout=mock_layout)
+            self.assertEqual(cache.layout([b"a"], "svg"), b"output")
+            for name in os.listdir(temp_dir):
+                os.chmod(os.path.join(temp_dir, name), 0o444)
+            # The file mode is not enough when running as root.
+            with unittest.mock.patch('os.utime', mock_utime):
+                self.assertEqual(cache.layout([b"a"], "svg"), b"output")
+            self.assertEqual(len(layouts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+#
+# Copyright Miklos Vajna
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+
+"""Benchmarks for the performance-sensitive parts of ged2dot."""
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import cast
+import argparse
+import concurrent.futures
+import glob
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+import familytree
+import ged2dot
+import inlineize
+
+
+def create_tree_graph(node_count: int) -> familytree.Graph:
+    """
+    Creates a resolved graph with about node_count nodes: family N has a wife and 2 children, the
+    children are the husbands in families 2N+1 and 2N+2.
+    """
+    graph = familytree.Graph()
+    families: List[familytree.Family] = []
+    for index in range(node_count // 4):
+        family = familytree.Family()
+        family.set_identifier(f"F{index}")
+        wife = familytree.Individual()
+        wife.set_identifier(f"W{index}")
+        wife.fams_list.append(family)
+        family.wife = wife
+        if index:
+            husb = families[(index - 1) // 2].child_list[(index - 1) % 2]
+        else:
+            husb = familytree.Individual()
+            husb.set_identifier("H0")
+            graph.append(husb)
+        husb.fams_list.append(family)
+        family.husb = husb
+        for child_index in range(2):
+            child = familytree.Individual()
+            child.set_identifier(f"C{index}_{child_index}")
+            child.famc = family
+            family.child_list.append(child)
+            graph.append(child)
+        graph.append(wife)
+        graph.append(family)
+        families.append(family)
+    return graph
+
+
+class GedcomGenerator:
+    """
+    Generates a deterministic, connected family tree: it grows from a single couple until a
+    generation has about individual_count / generation_count members, then each generation has
+    about the same size.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, individual_count: int, generation_count: int = 10, children: int = 3) -> None:
+        self.individual_count = individual_count
+        self.family_limit = max(1, individual_count // generation_count // (children + 1))
+        self.children = children
+        self.remarriage = 0.1
+        self.collapse = 0.05
+        self.rng = random.Random(0)
+        self.forenames = {
+            "M": ["Adam", "Bob", "David", "Frank", "Henry", "John", "Peter", "Steve"],
+            "F": ["Alice", "Claire", "Eve", "Grace", "Julia", "Mary", "Rose", "Susan"],
+        }
+        self.surnames = [f"Surname{i}" for i in range(1000)]
+        self.lines: List[str] = []
+        self.individuals: List[List[str]] = []
+        self.families: List[List[str]] = []
+
+    def __add_individual(self, sex: str, year: int, surname: str = "", famc: str = "") -> int:
+        """Adds an individual, returns its index."""
+        identifier = f"P{len(self.individuals) + 1}"
+        if not surname:
+            surname = self.rng.choice(self.surnames)
+        forename = self.rng.choice(self.forenames[sex])
+        record = [f"0 @{identifier}@ INDI", f"1 NAME {forename} /{surname}/", f"1 SEX {sex}", "1 BIRT",
+                  f"2 DATE {year + self.rng.randrange(10)}"]
+        if self.rng.random() < 0.5:
+            record += ["1 DEAT", f"2 DATE {year + 40 + self.rng.randrange(50)}"]
+        if self.rng.random() < 0.2:
+            record += ["1 OCCU Farmer"]
+        if self.rng.random() < 0.2:
+            record += ["1 SOUR @S1@", "2 PAGE Parish register"]
+        if famc:
+            record.append(f"1 FAMC @{famc}@")
+        self.individuals.append(record)
+        return len(self.individuals) - 1
+
+    def __add_family(self, husb: int, wife: int, year: int) -> str:
+        """Adds a family with children, returns its identifier."""
+        identifier = f"F{len(self.families) + 1}"
+        husb_record = self.individuals[husb]
+        wife_record = self.individuals[wife]
+        husb_record.append(f"1 FAMS @{identifier}@")
+        wife_record.append(f"1 FAMS @{identifier}@")
+        record = [f"0 @{identifier}@ FAM", f"1 HUSB {husb_record[0][2:-6]}", f"1 WIFE {wife_record[0][2:-6]}",
+                  "1 MARR", f"2 DATE {year}"]
+        self.families.append(record)
+        return identifier
+
+    def __add_children(self, family: str, surname: str, year: int, unmarried: Dict[str, List[Tuple[int, str]]]) -> None:
+        """Adds the children of the last family, collecting them to unmarried by sex."""
+        for _ in range(self.rng.randint(1, 2 * self.children - 1)):
+            sex = self.rng.choice("MF")
+            child = self.__add_individual(sex, year, surname, family)
+            self.families[-1].append(f"1 CHIL @P{child + 1}@")
+            unmarried[sex].append((child, family))
+
+    def generate(self) -> bytes:
+        """Generates the gedcom."""
+        surname = self.rng.choice(self.surnames)
+        year = 1600
+        # Unmarried (index, family identifier) pairs of the previous generation.
+        sons = [(self.__add_individual("M", year - 25, surname), "")]
+        daughters: List[Tuple[int, str]] = []
+        while len(self.individuals) < self.individual_count:
+            self.rng.shuffle(sons)
+            next_sons: List[Tuple[int, str]] = []
+            next_daughters: List[Tuple[int, str]] = []
+            for husb, husb_famc in sons[:self.family_limit]:
+                if len(self.individuals) >= self.individual_count:
+                    break
+                husb_surname = self.individuals[husb][1].split("/")[1]
+                wives = 2 if self.rng.random() < self.remarriage else 1
+                for _ in range(wives):
+                    wife = self.__pick_cousin(daughters, husb_famc)
+                    if wife is None:
+                        wife = self.__add_individual("F", year - 25)
+                    family = self.__add_family(husb, wife, year)
+                    self.__add_children(family, husb_surname, year, {"M": next_sons, "F": next_daughters})
+            sons = next_sons
+            daughters = next_daughters
+            year += 25
+
+        self.lines = ["0 HEAD", "1 CHAR UTF-8"]
+        for record in self.individuals + self.families:
+            self.lines += record
+        self.lines += ["0 @S1@ SOUR", "1 TITL Synthetic", "0 TRLR"]
+        return "\r\n".join(self.lines).encode("utf-8")
+
+    def __pick_cousin(self, daughters: List[Tuple[int, str]], husb_famc: str) -> Optional[int]:
+        """Picks an unmarried woman of the same generation who is not a sister, sometimes."""
+        if not daughters or self.rng.random() >= self.collapse:
+            return None
+        index = self.rng.randrange(len(daughters))
+        wife, wife_famc = daughters[index]
+        if wife_famc == husb_famc:
+            return None
+        del daughters[index]
+        return wife
+
+
+def get_git_revision() -> str:
+    """Returns the commit hash of the working directory, if possible."""
+    try:
+        process = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, check=True)
+        return process.stdout.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def time_phases(gedcom: bytes, familydepth: int) -> Dict[str, Any]:
+    """Times the separate phases of converting gedcom, starting from F1."""
+    result: Dict[str, Any] = {}
+    start = time.perf_counter()
+    graph = ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(gedcom))
+    result["tokenize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.resolve()
+    result["resolve"] = time.perf_counter() - start
+
+    root = graph.find("F1")
+    assert root
+    config = {
+        "familydepth": str(familydepth),
+        "output": "-",
+    }
+    start = time.perf_counter()
+    subgraph = familytree.bfs(root, config)
+    result["bfs"] = time.perf_counter() - start
+    result["subgraph"] = len(subgraph)
+
+    start = time.perf_counter()
+    ged2dot.DotExport().store_to_stream(subgraph, io.BytesIO(), config)
+    result["store_to_stream"] = time.perf_counter() - start
+    return result
+
+
+def bench_scaling(args: argparse.Namespace) -> None:
+    """Times the separate phases of a conversion on growing synthetic trees."""
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        generator = GedcomGenerator(size, args.generations, args.children)
+        generator.remarriage = args.remarriage
+        generator.collapse = args.collapse
+        gedcom = generator.generate()
+        result: Dict[str, Any] = {"individuals": len(generator.individuals), "families": len(generator.families)}
+        result.update(time_phases(gedcom, args.familydepth))
+        print(", ".join(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}"
+                        for key, value in result.items()), file=sys.stderr)
+        results.append(result)
+
+    report = {
+        "revision": get_git_revision(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+        return
+    with open(args.output, "w", encoding="utf-8") as stream:
+        json.dump(report, stream, indent=4)
+        stream.write("\n")
+
+
+def bench_generate(args: argparse.Namespace) -> None:
+    """Writes a synthetic gedcom file."""
+    generator = GedcomGenerator(args.individuals, args.generations, args.children)
+    generator.remarriage = args.remarriage
+    generator.collapse = args.collapse
+    with open(args.output, "wb") as stream:
+        stream.write(generator.generate())
+
+
+def bench_export(args: argparse.Namespace) -> None:
+    """Times the DOT export of a synthetic subgraph."""
+    gedcom = GedcomGenerator(args.individuals).generate()
+    graph = ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(gedcom))
+    graph.resolve()
+    root = graph.find("F1")
+    assert root
+    config = {
+        "familydepth": "1000",
+        "output": "-",
+        "imagedir": args.imagedir,
+    }
+    subgraph = familytree.bfs(root, config)
+    stream = io.BytesIO()
+    start = time.perf_counter()
+    ged2dot.DotExport().store_to_stream(subgraph, stream, config)
+    seconds = time.perf_counter() - start
+    print(f"exported {len(subgraph)} nodes, {len(stream.getvalue())} bytes in {seconds:.3f}s")
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments which tune the shape of the synthetic tree."""
+    parser.add_argument("--generations", type=int, default=10,
+                        help="number of generations once the tree is fully grown (default: 10)")
+    parser.add_argument("--children", type=int, default=3, help="average children per family (default: 3)")
+    parser.add_argument("--remarriage", type=float, default=0.1,
+                        help="probability of a man marrying twice (default: 0.1)")
+    parser.add_argument("--collapse", type=float, default=0.05,
+                        help="probability of marrying a cousin instead of someone new (default: 0.05)")
+
+
+def bench_bfs(args: argparse.Namespace) -> None:
+    """Times a full traversal of a synthetic graph."""
+    start = time.perf_counter()
+    graph = create_tree_graph(args.nodes)
+    print(f"created {len(graph)} nodes in {time.perf_counter() - start:.3f}s")
+    root = graph.find("F0")
+    assert root
+    config = {
+        "familydepth": str(args.nodes),
+    }
+    start = time.perf_counter()
+    subgraph = familytree.bfs(root, config)
+    print(f"bfs visited {len(subgraph)} nodes in {time.perf_counter() - start:.3f}s")
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    """Measures the memory usage of a loaded graph."""
+    gedcom = GedcomGenerator(args.individuals).generate()
+    tracemalloc.start()
+    importer = ged2dot.GedcomImport()
+    if args.backend == "csr":
+        importer.graph = familytree.CsrGraph()
+    graph = importer.tokenize_from_stream(io.BytesIO(gedcom))
+    graph.resolve()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    individuals = gedcom.count(b" INDI\r\n")
+    print(f"loaded {individuals} individuals, {len(graph)} nodes")
+    print(f"graph size: {size} bytes, {size // individuals} bytes per individual")
+    print(f"peak during load: {peak} bytes, {peak // individuals} bytes per individual")
+
+
+def bench_tokenize(args: argparse.Namespace) -> None:
+    """Measures the tokenizer throughput in lines per second on the test inputs."""
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.ged")))
+    total_lines = 0
+    total_seconds = 0.0
+    for path in paths:
+        with open(path, "rb") as stream:
+            gedcom = stream.read()
+        lines = len(gedcom.splitlines()) * args.repeat
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(gedcom))
+        seconds = time.perf_counter() - start
+        total_lines += lines
+        total_seconds += seconds
+        print(f"{os.path.basename(path)}: {lines / seconds:.0f} lines/s")
+    print(f"total: {total_lines} lines in {total_seconds:.3f}s, {total_lines / total_seconds:.0f} lines/s")
+
+
+def bench_index(args: argparse.Namespace) -> None:
+    """Compares the size, build and query time of the subgraph index with traversing the graph."""
+    gedcom = GedcomGenerator(args.individuals).generate()
+    graph = familytree.to_csr_graph(ged2dot.GedcomImport().tokenize_from_stream(io.BytesIO(gedcom)))
+    families = graph.get_family_ids()
+    roots = random.Random(0).choices(families, k=args.queries)
+    print(f"{len(graph)} nodes, {len(families)} families, {args.queries} queries")
+    # Both bfs() and the index create node objects on first use, time them with all nodes created.
+    list(graph)
+    for max_family_depth in args.familydepths:
+        config = {"familydepth": str(max_family_depth)}
+        start = time.perf_counter()
+        for root in roots:
+            familytree.bfs(cast(familytree.Node, graph.find(root)), config)
+        bfs_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = familytree.SubgraphIndex(graph, max_family_depth)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        nodes = sum(len(index.get_subgraph(root, config)) for root in roots)
+        index_seconds = time.perf_counter() - start
+        size = index.get_size()
+        print(f"familydepth {max_family_depth}: {nodes // len(roots)} nodes per query, "
+              f"bfs {bfs_seconds * 1000 / len(roots):.3f}ms, index {index_seconds * 1000 / len(roots):.3f}ms "
+              f"per query; index built in {build_seconds:.3f}s, {size} bytes, {size // len(families)} bytes per family")
+
+
+def bench_inline(args: argparse.Namespace) -> None:
+    """Measures the time and output size of inlining the images of an SVG file."""
+    if args.latency:
+        read_data_uri = inlineize.read_data_uri
+
+        def slow_read_data_uri(path: str) -> Tuple[str, float]:
+            time.sleep(args.latency)
+            return read_data_uri(path)
+        inlineize.read_data_uri = slow_read_data_uri
+    with open(args.input, "rb") as stream:
+        svg = stream.read()
+    output = io.BytesIO()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        output = io.BytesIO()
+        inlineize.inlineize(io.BytesIO(svg), output)
+    seconds = (time.perf_counter() - start) / args.repeat
+    print(f"{svg.count(b'<image ')} images: {len(svg)} -> {len(output.getvalue())} bytes in {seconds:.3f}s")
+    timings = inlineize.inlineize(io.BytesIO(svg), io.BytesIO())
+    print(", ".join(f"{phase}: {seconds:.3f}s" for phase, seconds in timings.items()))
+
+    # Not counting the input and the output.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tracemalloc.start()
+        inlineize.inlineize(args.input, os.path.join(temp_dir, "output.svg"))
+        _size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"peak memory: {peak} bytes")
+
+
+def fetch(url: str) -> float:
+    """Fetches url, returns the time it took."""
+    start = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def bench_serve(args: argparse.Namespace) -> None:
+    """Measures the requests per second of a running 'ged2dot.py --serve' instance."""
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = sorted(executor.map(fetch, [args.url] * args.requests))
+    seconds = time.perf_counter() - start
+    median = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[len(latencies) * 99 // 100] * 1000
+    print(f"{args.requests} requests in {seconds:.3f}s: {args.requests / seconds:.1f} requests/s, "
+          f"median {median:.1f}ms, p99 {p99:.1f}ms")
+
+
+def main() -> None:
+    """Commandline interface to this module."""
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(required=True)
+
+    bfs_parser = subparsers.add_parser("bfs", help="traverse a synthetic graph")
+    bfs_parser.add_argument("--nodes", type=int, default=1000000, help="number of nodes (default: 1000000)")
+    bfs_parser.set_defaults(func=bench_bfs)
+
+    memory_parser = subparsers.add_parser("memory", help="measure the memory usage of a loaded graph")
+    memory_parser.add_argument("--individuals", type=int, default=100000,
+                               help="number of individuals (default: 100000)")
+    memory_parser.add_argument("--backend", choices=["objects", "csr"], default="objects",
+                               help="graph storage (default: objects)")
+    memory_parser.set_defaults(func=bench_memory)
+
+    tokenize_parser = subparsers.add_parser("tokenize", help="measure the tokenizer throughput")
+    tokenize_parser.add_argument("--directory", default="tests", help="directory of .ged files (default: tests)")
+    tokenize_parser.add_argument("--repeat", type=int, default=1000,
+                                 help="number of times each file is parsed (default: 1000)")
+    tokenize_parser.set_defaults(func=bench_tokenize)
+
+    generate_parser = subparsers.add_parser("generate", help="write a synthetic gedcom file")
+    generate_parser.add_argument("--individuals", type=int, default=10000,
+                                 help="number of individuals (default: 10000)")
+    add_generator_arguments(generate_parser)
+    generate_parser.add_argument("output", help="output path")
+    generate_parser.set_defaults(func=bench_generate)
+
+    export_parser = subparsers.add_parser("export", help="time the DOT export of a synthetic subgraph")
+    export_parser.add_argument("--individuals", type=int, default=100000,
+                               help="number of individuals (default: 100000)")
+    export_parser.add_argument("--imagedir", default="images",
+                               help="image directory, relative to the working directory (default: images)")
+    export_parser.set_defaults(func=bench_export)
+
+    index_parser = subparsers.add_parser("index", help="compare the subgraph index with traversing the graph")
+    index_parser.add_argument("--individuals", type=int, default=100000,
+                              help="number of individuals (default: 100000)")
+    index_parser.add_argument("--familydepths", type=int, nargs="+", default=[1, 2, 3, 4],
+                              help="maximum familydepths of the index (default: 1 2 3 4)")
+    index_parser.add_argument("--queries", type=int, default=1000,
+                              help="number of random root families (default: 1000)")
+    index_parser.set_defaults(func=bench_index)
+
+    inline_parser = subparsers.add_parser("inline", help="time inlining the images of an SVG file")
+    inline_parser.add_argument("--repeat", type=int, default=10, help="number of runs (default: 10)")
+    inline_parser.add_argument("--latency", type=float, default=0,
+                               help="seconds to wait before reading an image, to simulate slow storage (default: 0)")
+    inline_parser.add_argument("input", help="SVG file, e.g. from 'ged2dot.py --format svg'")
+    inline_parser.set_defaults(func=bench_inline)
+
+    serve_parser = subparsers.add_parser("serve", help="load test a running 'ged2dot.py --serve' instance")
+    serve_parser.add_argument("--requests", type=int, default=1000, help="number of requests (default: 1000)")
+    serve_parser.add_argument("--concurrency", type=int, default=8,
+                              help="number of parallel requests (default: 8)")
+    serve_parser.add_argument("url", help="URL to request, e.g. http://127.0.0.1:8000/dot?root=F1&depth=3")
+    serve_parser.set_defaults(func=bench_serve)
+
+    scaling_parser = subparsers.add_parser("scaling", help="time the phases of a conversion at growing sizes")
+    scaling_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                                help="number of individuals (default: 1000 10000 100000 1000000)")
+    add_generator_arguments(scaling_parser)
+    scaling_parser.add_argument("--familydepth", type=int, default=1000,
+                                help="depth of the traversal from F1 (default: 1000)")
+    scaling_parser.add_argument("--output", default="-", help="path of the JSON results (default: stdout)")
+    scaling_parser.set_defaults(func=bench_scaling)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab: